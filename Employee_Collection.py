@@ -1,16 +1,676 @@
-from flask import Flask,request,jsonify
+from flask import Flask,Response,request,jsonify,make_response,stream_with_context
 from flasgger import Swagger,swag_from
 import pymongo
+from pymongo import ReplaceOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+import argparse
+import csv
+import io
+import json
+import math
 import os
+import sys
+import threading
+import time
+import zlib
 from dotenv import load_dotenv
 #load environment variables
 load_dotenv("config.env")
 #mongoDB connection
 db_name=os.getenv('database')
 collection_name=os.getenv('collection')
-client=pymongo.MongoClient(host='localhost',port=27017)
+bulk_chunk_size=int(os.getenv('bulk_chunk_size',1000)) #employees per insert_many
+analytics_cache_ttl=float(os.getenv('analytics_cache_ttl',300)) #seconds, bounds staleness from other processes
+employee_cache_backend=os.getenv('employee_cache_backend','lru') #lru, redis or none
+employee_cache_size=int(os.getenv('employee_cache_size',10000)) #lru backend only
+employee_cache_ttl=int(os.getenv('employee_cache_ttl',60)) #seconds
+redis_url=os.getenv('redis_url','redis://localhost:6379/0')
+
+#connection pool settings (the sync and async apps share them)
+mongo_host=os.getenv('host','localhost')
+mongo_port=int(os.getenv('port',27017))
+mongo_options={
+    'maxPoolSize': int(os.getenv('mongo_max_pool_size',100)),
+    'minPoolSize': int(os.getenv('mongo_min_pool_size',0)),
+    'waitQueueTimeoutMS': int(os.getenv('mongo_wait_queue_timeout_ms',2000)),
+    'serverSelectionTimeoutMS': int(os.getenv('mongo_server_selection_timeout_ms',5000)),
+    'connectTimeoutMS': int(os.getenv('mongo_connect_timeout_ms',5000)),
+    'socketTimeoutMS': int(os.getenv('mongo_socket_timeout_ms',10000))
+}
+
+#pool statistics collected from pymongo connection pool events
+class PoolStats(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waits = threading.local()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def connection_check_out_started(self, event):
+        self.waits.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        #pymongo>=4.7 reports the wait itself, older versions are timed per thread
+        wait = getattr(event, 'duration', None)
+        if wait is None:
+            wait = time.perf_counter() - getattr(self.waits, 'started', time.perf_counter())
+        with self.lock:
+            self.checked_out += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.checkout_failed += 1
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.checked_in += 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.closed += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "max_pool_size": mongo_options['maxPoolSize'],
+                "open_connections": self.created - self.closed,
+                "in_use": self.checked_out - self.checked_in,
+                "checkouts": self.checked_out,
+                "checkout_failures": self.checkout_failed,
+                "avg_wait_ms": round(self.wait_total / self.checked_out * 1000, 3) if self.checked_out else 0,
+                "max_wait_ms": round(self.wait_max * 1000, 3)
+            }
+
+pool_stats = PoolStats()
+client=pymongo.MongoClient(host=mongo_host,port=mongo_port,event_listeners=[pool_stats],**mongo_options)
 db=client[db_name]
 collection = db[collection_name]
+versions = db[collection_name + '_versions'] #write counters behind the ETags of /out and /out/<emp_id>
+
+#indexes: emp_id is the lookup/pagination key, salary and age back the range filters and sorts
+EXPECTED_INDEXES = [
+    ([("emp_id", pymongo.ASCENDING)], True),
+    ([("salary", pymongo.ASCENDING), ("emp_id", pymongo.ASCENDING)], False),
+    ([("age", pymongo.ASCENDING), ("emp_id", pymongo.ASCENDING)], False)
+]
+def ensure_indexes():
+    for keys, unique in EXPECTED_INDEXES:
+        started = time.perf_counter()
+        try:
+            name = collection.create_index(keys, unique=unique)
+            print(f"Index {collection.name}.{name} ready in {time.perf_counter() - started:.2f}s")
+        except OperationFailure as e:
+            print(f"WARNING: could not build index {keys}: {e}")
+
+#query options of GET /out
+EMPLOYEE_FIELDS = ['emp_id', 'name', 'age', 'salary']
+SORT_FIELDS = ['emp_id', 'salary', 'age']
+def employee_filter(args):
+    query = {}
+    for field in ('salary', 'age'):
+        bounds = {}
+        if args.get('min_' + field) is not None:
+            bounds['$gte'] = int(args['min_' + field])
+        if args.get('max_' + field) is not None:
+            bounds['$lte'] = int(args['max_' + field])
+        if bounds:
+            query[field] = bounds
+    return query
+
+#keyset condition: rows after the (sort value, emp_id) of the last row of the previous page
+def keyset_filter(sort_field, direction, after):
+    op = '$gt' if direction == pymongo.ASCENDING else '$lt'
+    if sort_field == 'emp_id':
+        return {"emp_id": {op: int(after)}}
+    value, emp_id = (int(part) for part in after.split(','))
+    return {"$or": [{sort_field: {op: value}}, {sort_field: value, "emp_id": {op: emp_id}}]}
+
+def page_cursor(row, sort_field):
+    return str(row['emp_id']) if sort_field == 'emp_id' else f"{row[sort_field]},{row['emp_id']}"
+
+#find() arguments of GET /out from its query string (ValueError on bad parameters)
+def employee_listing(args):
+    sort = args.get('sort', 'emp_id')
+    sort_field = sort.lstrip('-')
+    direction = pymongo.DESCENDING if sort.startswith('-') else pymongo.ASCENDING
+    fields = args['fields'].split(',') if args.get('fields') else EMPLOYEE_FIELDS
+    limit = int(args.get('limit', 0))
+    if sort_field not in SORT_FIELDS or not set(fields) <= set(EMPLOYEE_FIELDS):
+        raise ValueError("Invalid sort or fields parameter")
+
+    query = employee_filter(args)
+    if args.get('after'):
+        query = {"$and": [query, keyset_filter(sort_field, direction, args['after'])]}
+    projection = {"_id": 0}
+    projection.update({field: 1 for field in set(fields) | ({'emp_id', sort_field} if limit else set())})
+    sort_spec = [(sort_field, direction)] + ([("emp_id", direction)] if sort_field != 'emp_id' else [])
+    return {"query": query, "projection": projection, "sort": sort_spec, "limit": limit, "sort_field": sort_field,
+            "fields": fields}
+
+#response body and status of GET /out: a page with its cursor when limit is set, else the plain list
+def listing_response(employees, listing):
+    if listing['limit']:
+        last = employees[-1] if len(employees) == listing['limit'] else None
+        next_after = page_cursor(last, listing['sort_field']) if last else None
+        #emp_id and the sort field were only fetched for the cursor: drop them unless fields= asked for them
+        extra = {'emp_id', listing['sort_field']} - set(listing['fields'])
+        if extra:
+            employees = [{key: value for key, value in employee.items() if key not in extra} for employee in employees]
+        return {"employees": employees, "next_after": next_after}, 200
+    if employees:
+        return employees, 200
+    else:
+        return {"message": "No data found in the database."}, 404
+
+#payroll analytics cache: results by (report, parameters), cleared by every employee write
+analytics_cache = {}
+analytics_lock = threading.Lock()
+analytics_generation = [0]  #bumped on every write, results computed across a write are not cached
+def cached_analytics(key, compute):
+    with analytics_lock:
+        entry = analytics_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        generation = analytics_generation[0]
+    result = compute()
+    with analytics_lock:
+        if generation == analytics_generation[0]:
+            analytics_cache[key] = (time.monotonic() + analytics_cache_ttl, result)
+    return result
+
+#called by the write handlers after the collection changed, with the emp_ids they touched and the kind
+#of write ('insert', 'update', 'replace' or 'delete', see version_writes)
+def employees_changed(*emp_ids, kind='update'):
+    with analytics_lock:
+        analytics_generation[0] += 1
+        analytics_cache.clear()
+    #versions first, so an entry reloaded after the invalidation already carries the new ETag
+    versions.bulk_write(version_writes(emp_ids, kind), ordered=False)
+    for emp_id in emp_ids:
+        employee_cache.invalidate(emp_id)
+
+#single-employee cache backends: get returns None on a miss
+class LRUBackend:
+    name = 'lru'
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  #key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry or entry[0] <= time.monotonic():
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+#external key-value backend shared by all workers; `docker run -p 6379:6379 redis` is enough locally
+class RedisBackend:
+    name = 'redis'
+
+    def __init__(self, url, ttl):
+        import redis  #optional dependency, only needed for this backend
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.redis.get(f"employee:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.redis.set(f"employee:{key}", json.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.redis.delete(f"employee:{key}")
+
+#read-through cache in front of find_one, with hit ratio and latency histograms
+LATENCY_BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100]
+class ReadThroughCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.histograms = {"hit": [0] * (len(LATENCY_BUCKETS_MS) + 1), "miss": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+
+    def get(self, key, load):
+        started = time.perf_counter()
+        value = None
+        if self.backend:
+            try:
+                value = self.backend.get(key)
+            except Exception:
+                self.record_error()  #a broken cache must not break reads
+        outcome = "hit" if value is not None else "miss"
+        if value is None:
+            value = load()
+            if value is not None and self.backend:
+                try:
+                    self.backend.set(key, value)
+                except Exception:
+                    self.record_error()
+        self.record(outcome, (time.perf_counter() - started) * 1000)
+        return value
+
+    #called after the MongoDB write already happened, so a broken cache must not fail the write
+    #(entries of an unreachable Redis still expire after employee_cache_ttl)
+    def invalidate(self, key):
+        if self.backend:
+            try:
+                self.backend.delete(key)
+            except Exception:
+                self.record_error()
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def record(self, outcome, elapsed_ms):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), len(LATENCY_BUCKETS_MS))
+        with self.lock:
+            if outcome == "hit":
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.histograms[outcome][bucket] += 1
+
+    def stats(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend.name if self.backend else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+                "latency_histogram": {outcome: dict(zip(labels, counts)) for outcome, counts in self.histograms.items()}
+            }
+
+def employee_cache_from_config():
+    if employee_cache_backend == 'redis':
+        return ReadThroughCache(RedisBackend(redis_url, employee_cache_ttl))
+    if employee_cache_backend == 'lru':
+        return ReadThroughCache(LRUBackend(employee_cache_size, employee_cache_ttl))
+    return ReadThroughCache(None)
+
+employee_cache = employee_cache_from_config()
+
+#ETAG VERSIONS
+#one counter for the whole collection ("collection"), bumped by every write, and one per updated
+#employee ("emp:<emp_id>"), kept in MongoDB so every worker sees the same versions.
+#inserts only bump the collection counter; deletes and replaces drop the employee's own version, so
+#the _versions collection only holds employees that were updated and still exist
+def version_writes(emp_ids=(), kind='insert'):
+    update = {"$inc": {"version": 1}, "$currentDate": {"modified_at": True}}
+    writes = [pymongo.UpdateOne({"_id": "collection"}, update, upsert=True)]
+    keys = [f"emp:{emp_id}" for emp_id in emp_ids]
+    if kind == 'update':
+        writes += [pymongo.UpdateOne({"_id": key}, update, upsert=True) for key in keys]
+    elif kind in ('delete', 'replace') and keys:
+        writes.append(pymongo.DeleteMany({"_id": {"$in": keys}}))
+    return writes
+
+def current_version(key):
+    entry = versions.find_one({"_id": key})
+    if not entry:
+        return 0, None
+    return entry['version'], entry['modified_at'].replace(tzinfo=timezone.utc)
+
+#cached per employee: the document together with its ETag, so a cache hit needs no MongoDB round trip.
+#an employee without its own version (never updated, or replaced since) takes the collection version
+#read at load time: the insert/replace that would change it also invalidates this entry.
+#the update timestamp is part of the ETag, as an employee's counter restarts after a delete
+def employee_entry(emp_id):
+    employee = collection.find_one({"emp_id": emp_id}, {"_id": 0})
+    if not employee:
+        return None
+    key = f"emp:{emp_id}"
+    entries = {entry['_id']: entry for entry in versions.find({"_id": {"$in": [key, "collection"]}})}
+    entry = entries.get(key) or entries.get("collection")
+    if not entry:
+        return {"employee": employee, "etag": f"{key}-0", "modified_at": None}
+    modified_at = entry['modified_at'].replace(tzinfo=timezone.utc).timestamp()
+    if entry['_id'] == key:
+        etag = f"{key}-{entry['version']}-{int(modified_at * 1000)}"
+    else:
+        etag = f"{key}-c{entry['version']}"
+    return {"employee": employee, "etag": etag, "modified_at": modified_at}
+
+#counts 304s and the bytes they saved, using the size of the last full response for the same URL and ETag
+class ETagStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sizes = LRUBackend(10000, 24 * 3600)
+        self.full_responses = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def record_full(self, key, size):
+        self.sizes.set(key, size)
+        with self.lock:
+            self.full_responses += 1
+            self.bytes_sent += size
+
+    def record_not_modified(self, key):
+        size = self.sizes.get(key) or 0
+        with self.lock:
+            self.not_modified += 1
+            self.bytes_saved += size
+
+    def stats(self):
+        with self.lock:
+            total = self.bytes_sent + self.bytes_saved
+            return {
+                "full_responses": self.full_responses,
+                "not_modified": self.not_modified,
+                "bytes_sent": self.bytes_sent,
+                "bytes_saved": self.bytes_saved,
+                "saved_ratio": round(self.bytes_saved / total, 3) if total else 0
+            }
+
+etag_stats = ETagStats()
+
+#answer 304 from the ETag alone when the client copy is current, else build the full response.
+#Last-Modified is informational only: it has whole-second resolution, so If-Modified-Since would answer
+#304 for a second write within the same second
+def conditional_get(etag, modified_at, build):
+    stats_key = (request.full_path, etag)
+    if request.if_none_match.contains_weak(etag):  #weak comparison: gzip proxies rewrite the ETag to W/"..."
+        etag_stats.record_not_modified(stats_key)
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        etag_stats.record_full(stats_key, len(response.get_data()))
+    response.set_etag(etag)
+    if modified_at:
+        response.last_modified = modified_at
+    return response
+
+DEFAULT_PERCENTILES = [25, 50, 75, 90, 95, 99]
+DEFAULT_AGE_BANDS = [18, 25, 35, 45, 55, 65]
+
+def salary_statistics(percentiles):
+    summary = next(collection.aggregate([
+        {"$match": {"salary": {"$type": "number"}}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "mean": {"$avg": "$salary"},
+            "min": {"$min": "$salary"},
+            "max": {"$max": "$salary"},
+            "total": {"$sum": "$salary"}
+        }},
+        {"$project": {"_id": 0}}
+    ]), None)
+    if summary is None:
+        return None
+    summary['mean'] = round(summary['mean'], 2)
+
+    #nearest-rank percentiles, each one a single skip/limit walk of the (salary, emp_id) index
+    summary['percentiles'] = {}
+    for percentile in percentiles:
+        rank = max(math.ceil(percentile / 100 * summary['count']), 1) - 1
+        row = next(collection.find({"salary": {"$type": "number"}}, {"_id": 0, "salary": 1})
+                   .sort([("salary", pymongo.ASCENDING), ("emp_id", pymongo.ASCENDING)]).skip(rank).limit(1), None)
+        summary['percentiles'][f"p{percentile}"] = row['salary'] if row else None
+    return summary
+
+def age_band_histogram(boundaries):
+    bands = collection.aggregate([
+        {"$match": {"salary": {"$type": "number"}, "age": {"$type": "number"}}},
+        {"$bucket": {
+            "groupBy": "$age",
+            "boundaries": boundaries,
+            "default": "other",
+            "output": {
+                "count": {"$sum": 1},
+                "mean_salary": {"$avg": "$salary"},
+                "min_salary": {"$min": "$salary"},
+                "max_salary": {"$max": "$salary"}
+            }
+        }}
+    ])
+    upper = dict(zip(boundaries, boundaries[1:]))
+    return [{
+        "age_band": band['_id'] if band['_id'] == "other" else f"{band['_id']}-{upper[band['_id']] - 1}",
+        "count": band['count'],
+        "mean_salary": round(band['mean_salary'], 2),
+        "min_salary": band['min_salary'],
+        "max_salary": band['max_salary']
+    } for band in bands]
+
+def int_list(value, default):
+    return sorted({int(part) for part in value.split(',')}) if value else default
+
+#validate one employee and coerce emp_id/age/salary to int (raises ValueError on bad data)
+REQUIRED_FIELDS = ['emp_id', 'name', 'age', 'salary']
+def employee_document(data):
+    if not isinstance(data, dict) or not all(field in data for field in REQUIRED_FIELDS):
+        raise ValueError("Missing required fields")
+    data['emp_id'] = int(data['emp_id'])
+    data['age'] = int(data['age'])
+    data['salary'] = int(data['salary'])
+    return data
+
+#validate one {emp_id, fields} patch of the bulk update (raises ValueError on bad data)
+def employee_patch(patch):
+    if not isinstance(patch, dict) or 'emp_id' not in patch or not isinstance(patch.get('fields'), dict):
+        raise ValueError("Each patch needs emp_id and fields")
+    fields = patch['fields']
+    if not fields or not set(fields) <= {'name', 'age', 'salary'}:
+        raise ValueError("fields must contain name, age and/or salary")
+    update = {field: int(value) if field in ('age', 'salary') else value for field, value in fields.items()}
+    return int(patch['emp_id']), update
+
+#EXPORT
+#streams the collection from a cursor, encoding and (optionally) gzip-compressing one batch at a time,
+#so memory stays constant whatever the collection size
+def export_chunks(query, fmt='csv', compress=False, batch_size=1000, progress=None):
+    cursor = collection.find(query, {"_id": 0, **{field: 1 for field in EMPLOYEE_FIELDS}}, batch_size=batch_size)
+    gzip = zlib.compressobj(wbits=31) if compress else None  #wbits=31 writes the gzip container
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EMPLOYEE_FIELDS, extrasaction='ignore')
+    if fmt == 'csv':
+        writer.writeheader()
+
+    started = time.perf_counter()
+    rows = 0
+    for batch in chunked(cursor, batch_size):
+        for employee in batch:
+            if fmt == 'csv':
+                writer.writerow(employee)
+            else:
+                buffer.write(json.dumps(employee) + "\n")
+        rows += len(batch)
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        yield gzip.compress(data) if gzip else data
+        if progress:
+            progress(rows, time.perf_counter() - started)
+    if fmt == 'csv' and rows == 0:
+        yield gzip.compress(buffer.getvalue().encode('utf-8')) if gzip else buffer.getvalue().encode('utf-8')
+    if gzip:
+        yield gzip.flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"Exported {rows} employees in {elapsed:.2f}s ({rows / elapsed if elapsed else rows:.0f} rows/sec)",
+          file=sys.stderr)
+
+#split an iterable into lists of at most size items
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+#(row, payload) for each non-blank NDJSON line, unparsable lines carry the exception
+def ndjson_rows(stream):
+    for row, line in enumerate(stream):
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, e
+
+#rows of a bulk request body: JSON array or NDJSON stream, None if the body is neither
+def bulk_rows():
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return ndjson_rows(request.stream)
+    data = request.get_json(silent=True)
+    return enumerate(data) if isinstance(data, list) else None
+
+#validate and insert one chunk with a single unordered insert_many,
+#or replace-by-emp_id with upsert so that writing the same chunk twice is harmless
+def insert_employee_chunk(chunk, upsert=False):
+    errors, rows, employees = [], [], []
+    for row, data in chunk:
+        try:
+            if isinstance(data, Exception):
+                raise data
+            employees.append(employee_document(data))
+            rows.append(row)
+        except (ValueError, TypeError) as e:
+            errors.append({"row": row, "error": str(e)})
+    if not employees:
+        return [], errors
+
+    failed = set()
+    try:
+        if upsert:
+            collection.bulk_write([ReplaceOne({"emp_id": employee['emp_id']}, employee, upsert=True)
+                                   for employee in employees], ordered=False)
+        else:
+            collection.insert_many(employees, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get('writeErrors', []):
+            failed.add(write_error['index'])
+            errors.append({"row": rows[write_error['index']], "error": write_error['errmsg']})
+    return [employee['emp_id'] for index, employee in enumerate(employees) if index not in failed], errors
+
+#IMPORT
+#(row, record, end_offset) for each CSV record from byte offset start onwards, as dicts keyed by the header.
+#the file is read line by line so end_offset is exact even for quoted fields spanning lines
+def csv_records(file, start=0, start_row=0):
+    header = next(csv.reader([file.readline().decode('utf-8-sig')]))
+    if start:
+        file.seek(start)
+    offset = [file.tell()]
+
+    def lines():
+        for line in iter(file.readline, b''):
+            offset[0] += len(line)
+            yield line.decode('utf-8')
+
+    for row, values in enumerate(csv.reader(lines()), start_row):
+        if not any(values):
+            continue
+        yield row, dict(zip(header, values)), offset[0]
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"offset": 0, "row": 0}
+
+#write to a temp file and rename, so a crash never leaves a half-written checkpoint
+def write_checkpoint(path, offset, row):
+    with open(path + '.tmp', 'w') as file:
+        json.dump({"offset": offset, "row": row}, file)
+    os.replace(path + '.tmp', path)
+
+#import a CSV dump in chunks of chunk_size through up to workers concurrent writers.
+#chunks are checkpointed in file order once they and every chunk before them are written,
+#so a rerun resumes from the first chunk that may not have completed
+def import_csv(path, chunk_size=1000, workers=1, upsert=False, checkpoint_path=None, progress=None):
+    checkpoint_path = checkpoint_path or path + '.checkpoint'
+    checkpoint = read_checkpoint(checkpoint_path)
+    totals = {"inserted": 0, "errors": 0}
+    started = time.perf_counter()
+
+    def finish(future, end_offset, end_row):
+        emp_ids, errors = future.result()
+        if emp_ids:
+            employees_changed(*emp_ids, kind='replace' if upsert else 'insert')
+        for error in errors:
+            print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+        totals["inserted"] += len(emp_ids)
+        totals["errors"] += len(errors)
+        write_checkpoint(checkpoint_path, end_offset, end_row)
+        if progress:
+            progress(totals["inserted"], time.perf_counter() - started)
+
+    with open(path, 'rb') as file, ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()  #(future, end_offset, end_row) in file order
+        records = csv_records(file, checkpoint["offset"], checkpoint["row"])
+        for chunk in chunked(records, chunk_size):
+            rows = [(row, record) for row, record, end_offset in chunk]
+            pending.append((pool.submit(insert_employee_chunk, rows, upsert), chunk[-1][2], chunk[-1][0] + 1))
+            #bounded in-flight work keeps memory constant
+            while len(pending) >= workers or (pending and pending[0][0].done()):
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+
+    if os.path.exists(checkpoint_path):  #no chunk ran for an empty or header-only file
+        os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - started
+    print(f"Imported {totals['inserted']} employees ({totals['errors']} errors) in {elapsed:.2f}s "
+          f"({totals['inserted'] / elapsed if elapsed else totals['inserted']:.0f} rows/sec)", file=sys.stderr)
+    return totals
 
 #flask app
 app = Flask(__name__)
@@ -60,25 +720,121 @@ def index():
 def insert_user():
  try:
     data = request.get_json()
-    required_fields = ['emp_id', 'name', 'age', 'salary']
 
-    if not data or not all(field in data for field in required_fields):
+    if not data or not all(field in data for field in REQUIRED_FIELDS):
         return jsonify({"error": "Missing required fields"}), 400
-    
-    data['emp_id'] = int(data['emp_id'])
-    data['age'] = int(data['age'])
-    data['salary'] = int(data['salary'])
 
-    result = collection.insert_one(data)
+    try:
+        result = collection.insert_one(employee_document(data))
+    except DuplicateKeyError:
+        return jsonify({"error": "Employee with this ID already exists"}), 400
+    employees_changed(data['emp_id'], kind='insert')
     return jsonify({"message": "User inserted", "id": str(result.inserted_id)})
 
  except Exception as e:
     return jsonify({"error": str(e)}), 500
 
+#post(bulk insert)
+@app.route("/insert_bulk", methods=["POST"])
+@swag_from({
+    'tags': ['Insert User'],
+    'consumes': ['application/json', 'application/x-ndjson'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'emp_id':{'type':'integer'},
+                        'name': {'type': 'string'},
+                        'age': {'type': 'integer'},
+                        'salary': {'type':'integer'}
+                    },
+                    'required': ['emp_id','name', 'age','salary']
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Users inserted, with the rows that failed',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'inserted': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'errors': {'type': 'array', 'items': {'type': 'object'}}
+                }
+            }
+        },
+        400:{
+            'description':'body is not a JSON array or NDJSON'
+        }
+    }
+})
+def insert_users_bulk():
+ try:
+    rows = bulk_rows()
+    if rows is None:
+        return jsonify({"error": "Body must be a JSON array or NDJSON"}), 400
+
+    inserted, errors = 0, []
+    for chunk in chunked(rows, bulk_chunk_size):
+        inserted_ids, chunk_errors = insert_employee_chunk(chunk)
+        inserted += len(inserted_ids)
+        errors.extend(chunk_errors)
+        if inserted_ids:
+            employees_changed(*inserted_ids, kind='insert')
+
+    return jsonify({"message": "Users inserted", "inserted": inserted, "failed": len(errors), "errors": errors})
+
+ except Exception as e:
+    return jsonify({"error": str(e)}), 500
+
 #get(read)
 @app.route('/out', methods=['GET'])
 @swag_from({
     'tags': ['Employee'],
+    'parameters': [
+        {'name': 'min_salary', 'in': 'query', 'type': 'integer', 'required': False},
+        {'name': 'max_salary', 'in': 'query', 'type': 'integer', 'required': False},
+        {'name': 'min_age', 'in': 'query', 'type': 'integer', 'required': False},
+        {'name': 'max_age', 'in': 'query', 'type': 'integer', 'required': False},
+        {
+            'name': 'fields',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma separated fields to return, e.g. emp_id,name'
+        },
+        {
+            'name': 'sort',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'enum': ['emp_id', '-emp_id', 'salary', '-salary', 'age', '-age'],
+            'description': 'Sort field, prefix with - for descending'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'required': False,
+            'description': 'Page size; the response becomes {employees, next_after}'
+        },
+        {
+            'name': 'after',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'next_after value of the previous page'
+        }
+    ],
     'responses': {
         200: {
             'description': 'A list of all employees',
@@ -110,12 +866,17 @@ def insert_user():
     }
 })
 def get_user():
-    employees = list(collection.find({}, {"_id": 0}))  # Get all employees without _id
+    try:
+        listing = employee_listing(request.args)
+    except ValueError:
+        return jsonify({"message": "Invalid query parameter."}), 400
 
-    if employees:
-        return jsonify(employees), 200
-    else:
-        return jsonify({"message": "No data found in the database."}), 404
+    def build():
+        cursor = collection.find(listing['query'], listing['projection']).sort(listing['sort']).limit(listing['limit'])
+        body, status = listing_response(list(cursor), listing)
+        return jsonify(body), status
+    version, modified_at = current_version("collection")
+    return conditional_get(f"collection-{version}", modified_at, build)
     
 
 @app.route('/out/<int:emp_id>', methods=['GET'])
@@ -148,12 +909,13 @@ def get_user():
     }
 })
 def get_user_by_id(emp_id):
-    employee = collection.find_one({"emp_id": emp_id}, {"_id": 0})  # Find by emp_id, exclude _id
-
-    if employee:
-        return jsonify(employee), 200
-    else:
+    # Find by emp_id, exclude _id (read through the employee cache, which also holds the ETag)
+    entry = employee_cache.get(emp_id, lambda: employee_entry(emp_id))
+    if not entry:
         return jsonify({"message": "No data found in the database."}), 404
+
+    modified_at = datetime.fromtimestamp(entry['modified_at'], timezone.utc) if entry['modified_at'] else None
+    return conditional_get(entry['etag'], modified_at, lambda: (jsonify(entry['employee']), 200))
     
 #put(update)
 @app.route('/out/<int:emp_id>', methods=['PUT'])
@@ -205,10 +967,11 @@ def update_employee(emp_id):
         "salary":data.get("salary")
     }
     result = collection.update_one({"emp_id":emp_id},{"$set":update_employee})
-    
+
     if result.matched_count == 0:
         return jsonify({"message":"employee not found"}),404
     else:
+     employees_changed(emp_id)
      return jsonify({"message": "Employee updated successfully"}), 200
 
 #delete(delete)    
@@ -244,8 +1007,383 @@ def delete_employee(emp_id):
     if result.deleted_count == 0:
         return jsonify({"message": "Employee not found"}), 404
     else:
+        employees_changed(emp_id, kind='delete')
         return jsonify({"message": "Employee deleted successfully"}), 200
 
+#put(bulk update)
+@app.route('/update_bulk', methods=['PUT'])
+@swag_from({
+    'tags': ['Employee'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'emp_id': {'type': 'integer'},
+                        'fields': {
+                            'type': 'object',
+                            'properties': {
+                                'name': {'type': 'string'},
+                                'age': {'type': 'integer'},
+                                'salary': {'type': 'integer'}
+                            }
+                        }
+                    },
+                    'required': ['emp_id', 'fields']
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Patches applied with one unordered bulk_write',
+            'examples': {
+                'application/json': {
+                    'message': 'Employees updated',
+                    'matched': 2,
+                    'modified': 2,
+                    'failed': 0,
+                    'errors': []
+                }
+            }
+        },
+        400: {
+            'description': 'Body is not a list of patches'
+        }
+    }
+})
+def update_employees_bulk():
+ try:
+    patches = request.get_json(silent=True)
+    if not isinstance(patches, list):
+        return jsonify({"error": "Body must be a list of {emp_id, fields} patches"}), 400
+
+    operations, emp_ids, errors = [], [], []
+    for row, patch in enumerate(patches):
+        try:
+            emp_id, update = employee_patch(patch)
+        except (ValueError, TypeError) as e:
+            errors.append({"row": row, "error": str(e)})
+            continue
+        operations.append(pymongo.UpdateOne({"emp_id": emp_id}, {"$set": update}))
+        emp_ids.append(emp_id)
+
+    matched = modified = 0
+    if operations:
+        try:
+            result = collection.bulk_write(operations, ordered=False)
+            matched, modified = result.matched_count, result.modified_count
+        except BulkWriteError as e:
+            matched, modified = e.details.get('nMatched', 0), e.details.get('nModified', 0)
+            errors.extend({"emp_id": emp_ids[error['index']], "error": error['errmsg']}
+                          for error in e.details.get('writeErrors', []))
+        employees_changed(*emp_ids)
+
+    return jsonify({"message": "Employees updated", "matched": matched, "modified": modified,
+                    "failed": len(errors), "errors": errors}), 200
+
+ except Exception as e:
+    return jsonify({"error": str(e)}), 500
+
+#delete(bulk delete)
+@app.route('/delete_bulk', methods=['DELETE'])
+@swag_from({
+    'tags': ['Employee'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'emp_ids': {'type': 'array', 'items': {'type': 'integer'}},
+                    'filter': {
+                        'type': 'object',
+                        'properties': {
+                            'min_salary': {'type': 'integer'},
+                            'max_salary': {'type': 'integer'},
+                            'min_age': {'type': 'integer'},
+                            'max_age': {'type': 'integer'}
+                        }
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Employees deleted with delete_many',
+            'examples': {
+                'application/json': {
+                    'message': 'Employees deleted',
+                    'deleted': 2
+                }
+            }
+        },
+        400: {
+            'description': 'Neither emp_ids nor a non-empty filter given'
+        }
+    }
+})
+def delete_employees_bulk():
+ try:
+    data = request.get_json(silent=True) or {}
+    if data.get('emp_ids'):
+        emp_ids = [int(emp_id) for emp_id in data['emp_ids']]
+    elif data.get('filter'):
+        query = employee_filter(data['filter'])
+        if not query:
+            return jsonify({"error": "filter must set a salary or age range"}), 400
+        #resolve the filter to ids first so caches and ETag versions of exactly those employees are invalidated
+        emp_ids = [employee['emp_id'] for employee in collection.find(query, {"_id": 0, "emp_id": 1})]
+    else:
+        return jsonify({"error": "Give emp_ids or a filter"}), 400
+
+    deleted = 0
+    for chunk in chunked(emp_ids, bulk_chunk_size):
+        deleted += collection.delete_many({"emp_id": {"$in": chunk}}).deleted_count
+        employees_changed(*chunk, kind='delete')
+
+    return jsonify({"message": "Employees deleted", "deleted": deleted}), 200
+
+ except Exception as e:
+    return jsonify({"error": str(e)}), 500
+
+#get(export)
+@app.route('/export', methods=['GET'])
+@swag_from({
+    'tags': ['Employee'],
+    'parameters': [
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['csv', 'ndjson'], 'default': 'csv'},
+        {'name': 'gzip', 'in': 'query', 'type': 'boolean', 'default': False},
+        {
+            'name': 'batch_size',
+            'in': 'query',
+            'type': 'integer',
+            'default': 1000,
+            'description': 'Documents per cursor batch and per encoded chunk'
+        },
+        {'name': 'min_salary', 'in': 'query', 'type': 'integer', 'required': False},
+        {'name': 'max_salary', 'in': 'query', 'type': 'integer', 'required': False},
+        {'name': 'min_age', 'in': 'query', 'type': 'integer', 'required': False},
+        {'name': 'max_age', 'in': 'query', 'type': 'integer', 'required': False}
+    ],
+    'produces': ['text/csv', 'application/x-ndjson', 'application/gzip'],
+    'responses': {
+        200: {
+            'description': 'Streamed export of the employee collection'
+        },
+        400: {
+            'description': 'Invalid query parameter'
+        }
+    }
+})
+def export_employees():
+    try:
+        fmt = request.args.get('format', 'csv')
+        compress = request.args.get('gzip', 'false').lower() == 'true'
+        batch_size = int(request.args.get('batch_size', 1000))
+        query = employee_filter(request.args)
+    except ValueError:
+        return jsonify({"message": "Invalid query parameter."}), 400
+    if fmt not in ('csv', 'ndjson') or batch_size < 1:
+        return jsonify({"message": "Invalid query parameter."}), 400
+
+    filename = f"employees.{fmt}" + (".gz" if compress else "")
+    mimetype = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    return Response(stream_with_context(export_chunks(query, fmt, compress, batch_size)), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+#get(payroll analytics)
+@app.route('/analytics/salary', methods=['GET'])
+@swag_from({
+    'tags': ['Analytics'],
+    'parameters': [
+        {
+            'name': 'percentiles',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma separated percentiles, default 25,50,75,90,95,99'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Salary statistics',
+            'examples': {
+                'application/json': {
+                    'count': 2,
+                    'mean': 55000.0,
+                    'min': 50000,
+                    'max': 60000,
+                    'total': 110000,
+                    'percentiles': {'p50': 50000, 'p90': 60000}
+                }
+            }
+        },
+        404: {
+            'description': 'No employees found'
+        }
+    }
+})
+def get_salary_statistics():
+    try:
+        percentiles = int_list(request.args.get('percentiles'), DEFAULT_PERCENTILES)
+    except ValueError:
+        return jsonify({"message": "Invalid percentiles parameter."}), 400
+    if not all(0 < percentile <= 100 for percentile in percentiles):
+        return jsonify({"message": "Percentiles must be between 1 and 100."}), 400
+
+    stats = cached_analytics(('salary', tuple(percentiles)), lambda: salary_statistics(percentiles))
+    if stats:
+        return jsonify(stats), 200
+    else:
+        return jsonify({"message": "No data found in the database."}), 404
+
+@app.route('/analytics/age_bands', methods=['GET'])
+@swag_from({
+    'tags': ['Analytics'],
+    'parameters': [
+        {
+            'name': 'boundaries',
+            'in': 'query',
+            'type': 'string',
+            'required': False,
+            'description': 'Comma separated age band boundaries, default 18,25,35,45,55,65'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Salary histogram by age band',
+            'examples': {
+                'application/json': [
+                    {'age_band': '25-34', 'count': 2, 'mean_salary': 55000.0, 'min_salary': 50000, 'max_salary': 60000}
+                ]
+            }
+        }
+    }
+})
+def get_age_band_histogram():
+    try:
+        boundaries = int_list(request.args.get('boundaries'), DEFAULT_AGE_BANDS)
+    except ValueError:
+        return jsonify({"message": "Invalid boundaries parameter."}), 400
+    if len(boundaries) < 2:
+        return jsonify({"message": "At least two boundaries are required."}), 400
+
+    histogram = cached_analytics(('age_bands', tuple(boundaries)), lambda: age_band_histogram(boundaries))
+    return jsonify(histogram), 200
+
+#get(employee cache statistics)
+@app.route('/cache_stats', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'responses': {
+        200: {
+            'description': 'Hit ratio and latency histograms of the single-employee cache',
+            'examples': {
+                'application/json': {
+                    'backend': 'lru',
+                    'hits': 950,
+                    'misses': 50,
+                    'errors': 0,
+                    'hit_ratio': 0.95,
+                    'latency_histogram': {
+                        'hit': {'<=0.1ms': 940, '<=0.5ms': 10},
+                        'miss': {'<=1ms': 35, '<=5ms': 15}
+                    }
+                }
+            }
+        }
+    }
+})
+def get_cache_stats():
+    return jsonify(employee_cache.stats()), 200
+
+#get(conditional GET statistics)
+@app.route('/etag_stats', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'responses': {
+        200: {
+            'description': 'Full responses vs 304 Not Modified on /out and /out/<emp_id>, with bytes saved',
+            'examples': {
+                'application/json': {
+                    'full_responses': 120,
+                    'not_modified': 4800,
+                    'bytes_sent': 9600000,
+                    'bytes_saved': 384000000,
+                    'saved_ratio': 0.976
+                }
+            }
+        }
+    }
+})
+def get_etag_stats():
+    return jsonify(etag_stats.stats()), 200
+
+#get(pool statistics)
+@app.route('/pool_stats', methods=['GET'])
+@swag_from({
+    'tags': ['Monitoring'],
+    'responses': {
+        200: {
+            'description': 'MongoDB connection pool statistics',
+            'examples': {
+                'application/json': {
+                    'max_pool_size': 100,
+                    'open_connections': 4,
+                    'in_use': 1,
+                    'checkouts': 5230,
+                    'checkout_failures': 0,
+                    'avg_wait_ms': 0.041,
+                    'max_wait_ms': 3.2
+                }
+            }
+        }
+    }
+})
+def get_pool_stats():
+    return jsonify(pool_stats.stats()), 200
+
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Employee collection service")
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'export', 'import'])
+    parser.add_argument('--format', default='csv', choices=['csv', 'ndjson'], help='export format')
+    parser.add_argument('--gzip', action='store_true', help='gzip the export')
+    parser.add_argument('--batch-size', type=int, default=1000, help='documents per cursor batch')
+    parser.add_argument('--output', help='export file (default: stdout)')
+    parser.add_argument('--input', help='CSV file to import (header: emp_id,name,age,salary)')
+    parser.add_argument('--chunk-size', type=int, default=bulk_chunk_size, help='employees per write')
+    parser.add_argument('--workers', type=int, default=1, help='concurrent chunk writers')
+    parser.add_argument('--upsert', action='store_true', help='replace existing employees by emp_id')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <input>.checkpoint)')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        def progress(rows, elapsed):
+            print(f"{rows} employees exported, {rows / elapsed if elapsed else rows:.0f} rows/sec", file=sys.stderr)
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for chunk in export_chunks({}, args.format, args.gzip, args.batch_size, progress):
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+    elif args.command == 'import':
+        if not args.input:
+            parser.error("import needs --input")
+        def progress(rows, elapsed):
+            print(f"{rows} employees imported, {rows / elapsed if elapsed else rows:.0f} rows/sec", file=sys.stderr)
+        ensure_indexes()
+        import_csv(args.input, args.chunk_size, args.workers, args.upsert, args.checkpoint, progress)
+    else:
+        ensure_indexes()
+        app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,76 @@
+from quart import Quart,Response,request,jsonify
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+from datetime import timezone
+from Employee_Collection import (db_name, collection_name, mongo_host, mongo_port, mongo_options, PoolStats,
+                                 REQUIRED_FIELDS, employee_document, employee_listing, listing_response,
+                                 version_writes)
+#asyncio variant of the /insert and /out routes of Employee_Collection.py:
+#one worker keeps many queries in flight on the event loop instead of blocking a thread per request
+
+#async mongoDB connection (same database, collection and pool settings as the sync app)
+pool_stats = PoolStats()
+client=AsyncIOMotorClient(host=mongo_host,port=mongo_port,event_listeners=[pool_stats],**mongo_options)
+db=client[db_name]
+collection = db[collection_name]
+versions = db[collection_name + '_versions']
+
+#quart app
+app = Quart(__name__)
+
+@app.route("/")
+async def index():
+    return "Quart+Motor!"
+
+#post(insert)
+@app.route("/insert", methods=["POST"])
+async def insert_user():
+ try:
+    data = await request.get_json()
+
+    if not data or not all(field in data for field in REQUIRED_FIELDS):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    try:
+        result = await collection.insert_one(employee_document(data))
+    except DuplicateKeyError:
+        return jsonify({"error": "Employee with this ID already exists"}), 400
+    #bump the collection ETag version served by the sync app
+    await versions.bulk_write(version_writes(), ordered=False)
+    return jsonify({"message": "User inserted", "id": str(result.inserted_id)})
+
+ except Exception as e:
+    return jsonify({"error": str(e)}), 500
+
+#get(read) with the same collection ETag as the sync app: 304 from the version alone when the client copy is current
+@app.route('/out', methods=['GET'])
+async def get_user():
+    try:
+        listing = employee_listing(request.args)
+    except ValueError:
+        return jsonify({"message": "Invalid query parameter."}), 400
+
+    entry = await versions.find_one({"_id": "collection"})
+    etag = f"collection-{entry['version'] if entry else 0}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response("", status=304)
+    else:
+        cursor = collection.find(listing['query'], listing['projection']).sort(listing['sort']).limit(listing['limit'])
+        body, status = listing_response(await cursor.to_list(length=None), listing)
+        response = jsonify(body)
+        response.status_code = status
+        if status != 200:
+            return response
+    response.set_etag(etag)
+    if entry:
+        response.last_modified = entry['modified_at'].replace(tzinfo=timezone.utc)
+    return response
+
+#get(pool statistics)
+@app.route('/pool_stats', methods=['GET'])
+async def get_pool_stats():
+    return jsonify(pool_stats.stats()), 200
+
+
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -1,8 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flasgger import Swagger, swag_from
 from textblob import TextBlob
 import pymongo
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import ObjectId
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,8 +25,17 @@ db_name1 = os.getenv('database1')  # ProductDetails
 collection_name1 = os.getenv('collection1')  # products
 collection_name2 = os.getenv('collection2')  # feedbacks
 collection_name3 = os.getenv('collection3')  # sentimentscore  
+collection_name4 = os.getenv('collection4', 'textscores')  # text polarity by text hash
 host = os.getenv('host')
 portclient = os.getenv('port')
+text_workers = int(os.getenv('text_workers', os.cpu_count() or 1))  # processes scoring feedback_text
+text_batch_size = int(os.getenv('text_batch_size', 64))  # texts sent to a worker at once
+bulk_chunk_size = int(os.getenv('bulk_chunk_size', 1000))  # documents per insert_many
+cursor_batch_size = int(os.getenv('cursor_batch_size', 1000))  # documents per getMore when streaming
+product_cache_size = int(os.getenv('product_cache_size', 10000))  # products kept in memory
+product_cache_ttl = float(os.getenv('product_cache_ttl', 60))  # seconds before a cached product is re-read
+recompute_interval = float(os.getenv('recompute_interval', 5))  # seconds between sentiment recompute passes
+recompute_batch_size = int(os.getenv('recompute_batch_size', 500))  # dirty products recomputed per bulk_write
 
 client = pymongo.MongoClient(host=str(host), port=int(portclient))
 
@@ -22,7 +43,534 @@ client = pymongo.MongoClient(host=str(host), port=int(portclient))
 db = client[db_name1]
 collection = db[collection_name1]  # FIXED: products collection
 collection2 = db[collection_name2]  # feedbacks collection
-collection3 = db[collection_name3]  # Connect to the sentimentscore collection 
+collection3 = db[collection_name3]  # Connect to the sentimentscore collection
+collection4 = db[collection_name4]  # text polarity cache, _id is the hash of the text
+
+# INDEXES
+# Every endpoint filters on product_id; the unique indexes also do the duplicate detection on insert.
+EXPECTED_INDEXES = [
+    (collection, [("product_id", pymongo.ASCENDING)], True),
+    (collection2, [("product_id", pymongo.ASCENDING), ("rating", pymongo.ASCENDING)], False),
+    (collection2, [("product_id", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)], False),  # keyset pages
+    (collection3, [("product_id", pymongo.ASCENDING)], True),
+    (collection3, [("average_polarity", pymongo.ASCENDING), ("product_id", pymongo.ASCENDING)], False),  # leaderboard
+    (collection3, [("dirty_at", pymongo.ASCENDING)], False)  # recompute scheduler
+]
+
+def ensure_indexes():
+    for target, keys, unique in EXPECTED_INDEXES:
+        started = time.perf_counter()
+        try:
+            name = target.create_index(keys, unique=unique)
+            print(f"Index {target.name}.{name} ready in {time.perf_counter() - started:.2f}s")
+        except OperationFailure as e:
+            print(f"WARNING: could not build index {target.name} {keys}: {e}")
+    return check_indexes()
+
+# Warn about expected indexes that do not exist (e.g. a unique build that failed on existing duplicates)
+def check_indexes():
+    missing = []
+    for target, keys, unique in EXPECTED_INDEXES:
+        existing = target.index_information().values()
+        if not any(index['key'] == keys and index.get('unique', False) == unique for index in existing):
+            missing.append((target.name, keys))
+            print(f"WARNING: missing {'unique ' if unique else ''}index on {target.name} {keys}")
+    return missing
+
+# PRODUCT CACHE
+# LRU/TTL cache of product documents, so existence checks on the feedback path skip MongoDB.
+# Product writes in this process invalidate entries; the TTL bounds staleness from other processes.
+class ProductCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()  # product_id -> (expires_at, product)
+        self.lock = threading.Lock()
+
+    def get(self, product_id):
+        with self.lock:
+            entry = self.entries.get(product_id)
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end(product_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        product = collection.find_one({"product_id": product_id}, {'_id': 0})
+        if product:
+            self.put(product)
+        return product
+
+    def exists(self, product_id):
+        return self.get(product_id) is not None
+
+    def put(self, product):
+        with self.lock:
+            self.entries[product['product_id']] = (time.monotonic() + self.ttl, product)
+            self.entries.move_to_end(product['product_id'])
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *product_ids):
+        with self.lock:
+            for product_id in product_ids:
+                self.entries.pop(product_id, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl
+            }
+
+product_cache = ProductCache(product_cache_size, product_cache_ttl)
+
+# SENTIMENT HELPERS
+# Convert a rating to sentiment and a polarity-like score normalized to range -1 to +1
+def rating_sentiment(rating):
+    if rating >= 4:
+        sentiment = "positive"
+    elif rating == 3:
+        sentiment = "neutral"
+    else:
+        sentiment = "negative"
+    return sentiment, round((rating - 3) / 2, 2)
+
+def polarity_sentiment(polarity):
+    return "positive" if polarity > 0 else "negative" if polarity < 0 else "neutral"
+
+def average_sentiment(avg_polarity):
+    return "positive" if avg_polarity > 0.2 else "negative" if avg_polarity < -0.2 else "neutral"
+
+# Pointer to the most positive / most negative feedback kept in sentimentscore.
+# polarity must stay the first key: $max/$min compare embedded documents field by field.
+def feedback_pointer(feedback):
+    return {
+        "polarity": rating_sentiment(feedback['rating'])[1],
+        "rating": feedback['rating'],
+        "text": feedback.get('feedback_text', ''),
+        "feedback_id": feedback.get('_id')
+    }
+
+# Build the running counters (count, polarity sum, rating counts, extremes) from feedback documents
+def counters_from_feedbacks(product_id, feedbacks):
+    counters = {"product_id": product_id, "total_feedbacks": 0, "polarity_sum": 0, "rating_counts": {}}
+    for feedback in feedbacks:
+        rating = feedback.get('rating')
+        if rating is None:
+            continue  # Skip if no rating
+        pointer = feedback_pointer(feedback)
+        counters['total_feedbacks'] += 1
+        counters['polarity_sum'] += pointer['polarity']
+        counters['rating_counts'][str(rating)] = counters['rating_counts'].get(str(rating), 0) + 1
+        if 'most_positive_feedback' not in counters or pointer['polarity'] > counters['most_positive_feedback']['polarity']:
+            counters['most_positive_feedback'] = pointer
+        if 'most_negative_feedback' not in counters or pointer['polarity'] < counters['most_negative_feedback']['polarity']:
+            counters['most_negative_feedback'] = pointer
+    return counters
+
+# Turn a counters document from sentimentscore into the public stats shape
+def stats_from_counters(counters):
+    total_feedbacks = counters.get('total_feedbacks', 0)
+    avg_polarity = round(counters.get('polarity_sum', 0) / total_feedbacks, 3) if total_feedbacks else 0
+
+    def public_pointer(pointer):
+        if not pointer or not total_feedbacks:
+            return None
+        return {"text": pointer['text'], "polarity": pointer['polarity'], "rating": pointer['rating']}
+
+    return {
+        "product_id": counters['product_id'],
+        "total_feedbacks": total_feedbacks,
+        "average_polarity": avg_polarity,
+        "average_sentiment": average_sentiment(avg_polarity),
+        "rating_counts": counters.get('rating_counts', {}),
+        "most_positive_feedback": public_pointer(counters.get('most_positive_feedback')),
+        "most_negative_feedback": public_pointer(counters.get('most_negative_feedback'))
+    }
+
+# Pipeline stages deriving the stored average_polarity/average_sentiment (used by the leaderboard)
+AVERAGE_STAGES = [
+    {"$set": {"average_polarity": {"$cond": [
+        {"$gt": ["$total_feedbacks", 0]},
+        {"$round": [{"$divide": ["$polarity_sum", "$total_feedbacks"]}, 3]},
+        0
+    ]}}},
+    {"$set": {"average_sentiment": {"$switch": {
+        "branches": [
+            {"case": {"$gt": ["$average_polarity", 0.2]}, "then": "positive"},
+            {"case": {"$lt": ["$average_polarity", -0.2]}, "then": "negative"}
+        ],
+        "default": "neutral"
+    }}}}
+]
+
+# Update replacing the counters of a product with freshly computed ones (also clears the dirty mark)
+def counters_update(counters):
+    stats = stats_from_counters(counters)
+    counters['average_polarity'] = stats['average_polarity']
+    counters['average_sentiment'] = stats['average_sentiment']
+    counters['computed_at'] = datetime.now(timezone.utc)
+    unset = {key: "" for key in ('most_positive_feedback', 'most_negative_feedback') if key not in counters}
+    unset['dirty_at'] = ""
+    return {"$set": counters, "$unset": unset}
+
+# dirty_at of a product's counters, read before taking a snapshot of its feedbacks:
+# None when the counters are clean, False when the product has no counters document yet
+def counters_marker(product_id):
+    entry = collection3.find_one({"product_id": product_id}, {"dirty_at": 1})
+    return entry.get('dirty_at') if entry else False
+
+# Overwrite the counters of a product with values rebuilt from a snapshot of its feedbacks, taken after
+# reading marker. Skipped if a feedback write landed meanwhile (dirty_at changed): the product stays dirty
+# for the scheduler. A first seed cannot be conditional, so it is stored dirty and verified by the scheduler.
+def store_sentiment_counters(counters, marker):
+    if marker is False:
+        update = counters_update(counters)
+        del update["$unset"]["dirty_at"]
+        update["$currentDate"] = {"dirty_at": True}
+        try:
+            collection3.update_one({"product_id": counters['product_id']}, update, upsert=True)
+        except DuplicateKeyError:
+            pass  # seeded concurrently
+        return counters
+    collection3.update_one({"product_id": counters['product_id'], "dirty_at": marker}, counters_update(counters))
+    return counters
+
+# computed_at/stale markers: stale while feedback writes since the last full computation are not reconciled
+def sentiment_freshness(counters):
+    return {"computed_at": counters.get('computed_at'), "stale": 'dirty_at' in counters}
+
+# Stored counters of a product, seeded once if they went missing; None if the product does not exist
+def load_sentiment_counters(product_id):
+    counters = collection3.find_one({"product_id": product_id, "polarity_sum": {"$exists": True}})
+    if counters:
+        return counters
+    if not product_cache.exists(product_id):
+        return None
+    return rebuild_sentiment_counters(product_id)
+
+# Full rescan of a product's feedbacks, used to seed counters that do not exist yet
+def rebuild_sentiment_counters(product_id):
+    marker = counters_marker(product_id)
+    feedbacks = collection2.find({'product_id': product_id}, {'feedback_text': 1, 'rating': 1})
+    return store_sentiment_counters(counters_from_feedbacks(product_id, feedbacks), marker)
+
+# Re-read the extremes after the feedback they pointed to was changed or removed
+def refresh_sentiment_pointers(product_id):
+    query = {"product_id": product_id, "rating": {"$ne": None}}
+    projection = {'feedback_text': 1, 'rating': 1}
+    update = {"$set": {}, "$unset": {}}
+    for key, direction in (('most_positive_feedback', pymongo.DESCENDING), ('most_negative_feedback', pymongo.ASCENDING)):
+        feedback = collection2.find_one(query, projection, sort=[("rating", direction)])
+        if feedback:
+            update["$set"][key] = feedback_pointer(feedback)
+        else:
+            update["$unset"][key] = ""
+    collection3.update_one({"product_id": product_id}, {op: fields for op, fields in update.items() if fields})
+
+# Apply feedback changes of one product to the running counters with a single atomic update
+def apply_feedback_changes(product_id, added=(), removed=()):
+    added = [feedback for feedback in added if feedback.get('rating') is not None]
+    removed = [feedback for feedback in removed if feedback.get('rating') is not None]
+    inc = {"total_feedbacks": 0, "polarity_sum": 0}
+    for feedbacks, sign in ((added, 1), (removed, -1)):
+        for feedback in feedbacks:
+            key = "rating_counts." + str(feedback['rating'])
+            inc['total_feedbacks'] += sign
+            inc['polarity_sum'] += sign * rating_sentiment(feedback['rating'])[1]
+            inc[key] = inc.get(key, 0) + sign
+
+    # pipeline update: the $inc/$max/$min equivalents plus the stored average, still one atomic write
+    # (pointers go through $literal because feedback text may start with "$")
+    counters_stage = {field: {"$add": [{"$ifNull": ["$" + field, 0]}, amount]} for field, amount in inc.items()}
+    counters_stage["dirty_at"] = "$$NOW"  # queue the product for the background recompute
+    if added:
+        pointers = [feedback_pointer(feedback) for feedback in added]
+        counters_stage["most_positive_feedback"] = {
+            "$max": ["$most_positive_feedback", {"$literal": max(pointers, key=lambda x: x['polarity'])}]}
+        counters_stage["most_negative_feedback"] = {
+            "$min": ["$most_negative_feedback", {"$literal": min(pointers, key=lambda x: x['polarity'])}]}
+
+    counters = collection3.find_one_and_update(
+        {"product_id": product_id, "polarity_sum": {"$exists": True}},
+        [{"$set": counters_stage}] + AVERAGE_STAGES,
+        return_document=pymongo.ReturnDocument.AFTER
+    )
+    if counters is None:
+        # No counters yet for this product: seed them from the feedbacks collection once
+        return rebuild_sentiment_counters(product_id)
+
+    removed_ids = {feedback.get('_id') for feedback in removed}
+    if removed_ids and any((counters.get(key) or {}).get('feedback_id') in removed_ids
+                           for key in ('most_positive_feedback', 'most_negative_feedback')):
+        refresh_sentiment_pointers(product_id)
+    return counters
+
+def apply_feedback_change(product_id, added=None, removed=None):
+    return apply_feedback_changes(product_id, [added] if added else [], [removed] if removed else [])
+
+# Keep counters right when a feedback is edited (possibly moved to another product)
+def apply_feedback_update(previous, data):
+    updated = dict(previous, **data)
+    if updated['product_id'] == previous['product_id']:
+        apply_feedback_change(previous['product_id'], added=updated, removed=previous)
+    else:
+        apply_feedback_change(previous['product_id'], removed=previous)
+        apply_feedback_change(updated['product_id'], added=updated)
+
+# Server-side version of counters_from_feedbacks: one aggregation grouped by product, raw feedbacks
+# never leave MongoDB. product_ids=None computes every product in the collection.
+def aggregate_sentiment_counters_many(product_ids=None):
+    match = {"rating": {"$ne": None}}
+    if product_ids is not None:
+        match["product_id"] = {"$in": list(product_ids)}
+    pointer = {"polarity": "$polarity", "rating": "$_id.rating", "text": "$text", "feedback_id": "$feedback_id"}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"product_id": "$product_id", "rating": "$rating"},
+            "count": {"$sum": 1},
+            "text": {"$first": "$feedback_text"},
+            "feedback_id": {"$first": "$_id"}
+        }},
+        {"$addFields": {"polarity": {"$round": [{"$divide": [{"$subtract": ["$_id.rating", 3]}, 2]}, 2]}}},
+        {"$sort": {"_id.product_id": 1, "_id.rating": -1}},
+        {"$group": {
+            "_id": "$_id.product_id",
+            "total_feedbacks": {"$sum": "$count"},
+            "polarity_sum": {"$sum": {"$multiply": ["$count", "$polarity"]}},
+            "rating_counts": {"$push": {"k": {"$toString": "$_id.rating"}, "v": "$count"}},
+            "most_positive_feedback": {"$first": pointer},
+            "most_negative_feedback": {"$last": pointer}
+        }},
+        {"$project": {"_id": 0, "product_id": "$_id", "total_feedbacks": 1, "polarity_sum": 1, "most_positive_feedback": 1,
+                      "most_negative_feedback": 1, "rating_counts": {"$arrayToObject": "$rating_counts"}}}
+    ]
+    return collection2.aggregate(pipeline, allowDiskUse=True)
+
+def aggregate_sentiment_counters(product_id):
+    return next(aggregate_sentiment_counters_many([product_id]), None)
+
+# BACKGROUND RECOMPUTE
+# Feedback writes stamp dirty_at on the product's counters; this drains the oldest dirty products,
+# recomputes them from the feedbacks and writes them back in one bulk_write.
+def recompute_dirty_sentiments(batch_size=None):
+    batch_size = batch_size or recompute_batch_size
+    dirty = collection3.find({"dirty_at": {"$type": "date"}}, {'product_id': 1, 'dirty_at': 1}) \
+        .sort("dirty_at", pymongo.ASCENDING).limit(batch_size)
+    seen = {entry['product_id']: entry['dirty_at'] for entry in dirty}
+    if not seen:
+        return 0
+
+    computed = {counters['product_id']: counters for counters in aggregate_sentiment_counters_many(seen)}
+    writes = [
+        # skipped if the product was written again meanwhile: it stays dirty for the next pass
+        pymongo.UpdateOne({"product_id": product_id, "dirty_at": dirty_at},
+                          counters_update(computed.get(product_id) or counters_from_feedbacks(product_id, [])))
+        for product_id, dirty_at in seen.items()
+    ]
+    collection3.bulk_write(writes, ordered=False)
+    return len(writes)
+
+# Full catalog refresh: every product from one grouped aggregation, upserted in unordered bulk_write chunks
+def recompute_all_sentiments(chunk_size=None):
+    chunk_size = chunk_size or bulk_chunk_size
+    # skipping dirtied products relies on the duplicate key of their upsert: without the unique index
+    # it would insert a second counters document instead
+    if any(name == collection3.name and keys == [("product_id", pymongo.ASCENDING)] for name, keys in check_indexes()):
+        raise RuntimeError(f"unique index on {collection3.name}.product_id is missing, run ensure_indexes")
+    # server clock, the one $$NOW stamps dirty_at with: an app clock running ahead would miss early writes
+    started_at = client.admin.command('hello')['localTime'].replace(tzinfo=timezone.utc)
+    started = time.perf_counter()
+    processed = 0
+    # the aggregation is a snapshot: products written after started_at are left dirty for
+    # recompute_dirty_sentiments instead of being overwritten with counters that miss those writes
+    not_dirtied = {"$not": {"$gte": started_at}}
+    for chunk in chunked(aggregate_sentiment_counters_many(), chunk_size):
+        try:
+            collection3.bulk_write([
+                pymongo.UpdateOne({"product_id": counters['product_id'], "dirty_at": not_dirtied},
+                                  counters_update(counters), upsert=True)
+                for counters in chunk
+            ], ordered=False)
+        except BulkWriteError as e:
+            # a duplicate key is the upsert of a product dirtied meanwhile, anything else is a real failure
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+        processed += len(chunk)
+
+    # products whose feedbacks were all deleted were not in the aggregation: reset their counters
+    # ($not/$gte also matches counters without computed_at, e.g. seeded before it existed)
+    emptied = collection3.update_many(
+        {"polarity_sum": {"$exists": True}, "computed_at": {"$not": {"$gte": started_at}},
+         "dirty_at": not_dirtied},
+        {"$set": {"total_feedbacks": 0, "polarity_sum": 0, "rating_counts": {}, "average_polarity": 0,
+                  "average_sentiment": average_sentiment(0), "computed_at": datetime.now(timezone.utc)},
+         "$unset": {"most_positive_feedback": "", "most_negative_feedback": "", "dirty_at": ""}}
+    ).modified_count
+
+    elapsed = time.perf_counter() - started
+    return {
+        "products": processed,
+        "emptied_products": emptied,
+        "seconds": round(elapsed, 3),
+        "products_per_sec": round(processed / elapsed, 1) if elapsed else processed
+    }
+
+def run_sentiment_scheduler():
+    while True:
+        try:
+            while recompute_dirty_sentiments() == recompute_batch_size:
+                pass  # a full batch means more may be waiting
+        except Exception as e:
+            print(f"WARNING: sentiment recompute failed: {e}")
+        time.sleep(recompute_interval)
+
+def start_sentiment_scheduler():
+    thread = threading.Thread(target=run_sentiment_scheduler, name="sentiment-scheduler", daemon=True)
+    thread.start()
+    return thread
+
+# Split any iterable (e.g. a cursor) into lists of at most size items
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# TEXT SENTIMENT (TextBlob)
+# Runs in the worker processes: TextBlob is pure Python, so scoring is spread over processes, not threads
+def score_texts(texts):
+    return [round(TextBlob(text).sentiment.polarity, 3) for text in texts]
+
+text_executor = None
+
+def score_texts_parallel(texts):
+    global text_executor
+    if len(texts) <= text_batch_size:
+        return score_texts(texts)  # a single batch is not worth the round trip to a worker
+    if text_executor is None:
+        # spawn, not fork: by now pymongo's monitor threads and the scheduler thread are running
+        text_executor = ProcessPoolExecutor(max_workers=text_workers, mp_context=multiprocessing.get_context("spawn"))
+    batches = [texts[i:i + text_batch_size] for i in range(0, len(texts), text_batch_size)]
+    return [polarity for batch in text_executor.map(score_texts, batches) for polarity in batch]
+
+def text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+# Text polarity of each feedback. Scores are cached in their own collection keyed by the hash of the text
+# (never on the feedback documents, which the API returns), so only new or edited texts are scored
+# and identical texts only once.
+def text_polarities(feedbacks):
+    hashes = [text_hash(feedback['feedback_text']) for feedback in feedbacks]
+    scores = {}
+    for chunk in chunked(set(hashes), bulk_chunk_size):
+        scores.update((entry['_id'], entry['polarity']) for entry in collection4.find({"_id": {"$in": chunk}}))
+    pending = {}
+    for feedback, digest in zip(feedbacks, hashes):
+        if digest not in scores:
+            pending.setdefault(digest, feedback['feedback_text'])
+
+    scored = dict(zip(pending, score_texts_parallel(list(pending.values()))))
+    if scored:
+        collection4.bulk_write([pymongo.UpdateOne({"_id": digest}, {"$set": {"polarity": polarity}}, upsert=True)
+                                for digest, polarity in scored.items()], ordered=False)
+    scores.update(scored)
+    return [scores[digest] for digest in hashes]
+
+def text_feedback_query(product_id=None):
+    query = {"feedback_text": {"$type": "string"}}
+    if product_id is not None:
+        query["product_id"] = product_id
+    return query
+
+TEXT_PROJECTION = {'feedback_text': 1, 'rating': 1}
+
+# Stats of a product computed from text polarities instead of ratings
+def text_stats(product_id, feedbacks, polarities):
+    scored = [{"text": f['feedback_text'], "polarity": p, "rating": f.get('rating')} for f, p in zip(feedbacks, polarities)]
+    avg_polarity = round(sum(polarities) / len(polarities), 3) if polarities else 0
+    return {
+        "product_id": product_id,
+        "total_feedbacks": len(scored),
+        "average_polarity": avg_polarity,
+        "average_sentiment": average_sentiment(avg_polarity),
+        "most_positive_feedback": max(scored, key=lambda x: x['polarity'], default=None),
+        "most_negative_feedback": min(scored, key=lambda x: x['polarity'], default=None)
+    }
+
+def analyzed_feedback(product_id, feedback, polarity):
+    return {
+        'product_id': product_id,
+        'feedback_text': feedback.get('feedback_text', ''),
+        'rating': feedback.get('rating'),
+        'polarity': polarity,
+        'sentiment': polarity_sentiment(polarity)
+    }
+
+# One page of per-feedback results, in _id order so the next page starts after the last returned id
+def analyzed_feedback_page(product_id, limit=0, after=None, mode='rating'):
+    if mode == 'text':
+        query, projection = text_feedback_query(product_id), TEXT_PROJECTION
+    else:
+        query, projection = {"product_id": product_id, "rating": {"$ne": None}}, {'feedback_text': 1, 'rating': 1}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    feedbacks = list(collection2.find(query, projection).sort("_id", pymongo.ASCENDING).limit(limit))
+
+    if mode == 'text':
+        polarities = text_polarities(feedbacks)
+    else:
+        polarities = [rating_sentiment(feedback['rating'])[1] for feedback in feedbacks]
+    analyzed = [analyzed_feedback(product_id, f, p) for f, p in zip(feedbacks, polarities)]
+    next_after = str(feedbacks[-1]['_id']) if limit and len(feedbacks) == limit else None
+    return analyzed, next_after
+
+# Offline backfill: score every feedback_text in the collection, reporting throughput as it goes
+def backfill_text_sentiment(chunk_size=None):
+    chunk_size = chunk_size or text_batch_size * text_workers * 4
+    started = time.perf_counter()
+    processed = 0
+    cursor = collection2.find(text_feedback_query(), TEXT_PROJECTION, batch_size=chunk_size).sort("_id", pymongo.ASCENDING)
+    for chunk in chunked(cursor, chunk_size):
+        text_polarities(chunk)
+        processed += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"{processed} feedbacks scored, {processed / elapsed:.0f} docs/sec")
+    # earlier versions cached the scores on the feedback documents themselves
+    collection2.update_many({"text_hash": {"$exists": True}}, {"$unset": {"text_hash": "", "text_polarity": ""}})
+    elapsed = time.perf_counter() - started
+    print(f"Text sentiment backfill done: {processed} feedbacks in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.0f} docs/sec)")
+
+# Validate one feedback payload and coerce its types, raising ValueError on bad rows
+def feedback_document(data):
+    required_fields = ['product_id', 'user_name', 'feedback_text', 'rating']
+    if not isinstance(data, dict) or not all(field in data for field in required_fields):
+        raise ValueError("Missing required fields")
+    return {
+        'product_id': int(data['product_id']),
+        'user_name': str(data['user_name']),
+        'feedback_text': str(data['feedback_text']),
+        'rating': int(data['rating'])
+    }
+
+# Coerce the typed fields of a feedback update body
+def clean_feedback_update(data):
+    for field in ('product_id', 'rating'):
+        if field in data:
+            data[field] = int(data[field])
+    return data
 
 # Flask app
 app = Flask(__name__)
@@ -81,19 +629,20 @@ def insert_product():
         if not data or not all(field in data for field in required_fields):
             return jsonify({"error": "Missing required fields"}), 400
 
-        # Optional: check if product already exists
-        if collection.find_one({"product_id": int(data['product_id'])}):
-            return jsonify({"error": "Product with this ID already exists"}), 400
-
-        # Insert data
-        result = collection.insert_one({
+        # Insert data (the unique product_id index rejects duplicates)
+        product = {
             'product_id': int(data['product_id']),
             'product_name': str(data['product_name']),
             'product_category': str(data['product_category']),
             'product_price': int(data['product_price']),
             'product_manufacture_date': str(data['product_manufacture_date']),
             'product_expiration_date': str(data['product_expiration_date'])
-        })
+        }
+        try:
+            result = collection.insert_one(dict(product))
+        except DuplicateKeyError:
+            return jsonify({"error": "Product with this ID already exists"}), 400
+        product_cache.put(product)
 
         return jsonify({"message": "Product inserted successfully", "id": str(result.inserted_id)}), 200
 
@@ -105,6 +654,28 @@ def insert_product():
 @app.route("/get_all_products", methods=["GET"])
 @swag_from({
     'tags': ['Get All Products'],
+    'parameters': [
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'description': 'Page size (omit to return everything)'
+        },
+        {
+            'name': 'after',
+            'in': 'query',
+            'type': 'string',
+            'description': 'next_after value of the previous page'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['json', 'ndjson'],
+            'default': 'json',
+            'description': 'ndjson streams one document per line straight from the cursor'
+        }
+    ],
     'responses': {
         200: {
             'description': 'List of All Products',
@@ -125,7 +696,8 @@ def insert_product():
                             },
                             'required': ['product_id', 'product_name', 'product_category', 'product_price', 'product_manufacture_date', 'product_expiration_date']
                         }
-                    }
+                    },
+                    'next_after': {'type': 'integer'}
                 }
             },
             'examples': {
@@ -167,8 +739,22 @@ def insert_product():
 })
 def get_all_products():
     try:
-        products = list(collection.find({}, {'_id': 0}))
-        return jsonify({"products": products}), 200
+        limit = int(request.args.get('limit', 0))
+        after = request.args.get('after')
+        query = {"product_id": {"$gt": int(after)}} if after else {}
+        cursor = collection.find(query, {'_id': 0}, batch_size=cursor_batch_size)
+        if limit or after:
+            # keyset pagination: each page starts after the last product_id of the previous one
+            cursor = cursor.sort("product_id", pymongo.ASCENDING).limit(limit)
+
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(cursor)
+
+        products = list(cursor)
+        response = {"products": products}
+        if limit:
+            response['next_after'] = products[-1]['product_id'] if len(products) == limit else None
+        return jsonify(response), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -211,7 +797,7 @@ def get_all_products():
 })
 def get_product_by_id(product_id):
     try:
-        product = collection.find_one({"product_id": product_id}, {'_id': 0})
+        product = product_cache.get(product_id)
         if product:
             return jsonify(product), 200
         else:
@@ -252,6 +838,9 @@ def get_product_by_id(product_id):
         200: {
             'description': 'Product updated successfully'
         },
+        400: {
+            'description': 'Product with this ID already exists'
+        },
         404: {
             'description': 'Product not found'
         },
@@ -264,10 +853,13 @@ def update_product(product_id):
     try:
         data = request.get_json()
         result = collection.update_one({"product_id": product_id}, {"$set": data})
+        product_cache.invalidate(product_id, data.get('product_id'))
         if result.matched_count > 0:
             return jsonify({"message": "Product updated successfully"}), 200
         else:
             return jsonify({"error": "Product not found"}), 404
+    except DuplicateKeyError:
+        return jsonify({"error": "Product with this ID already exists"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -300,6 +892,7 @@ def update_product(product_id):
 def delete_product(product_id):
     try:
         result = collection.delete_one({"product_id": product_id})
+        product_cache.invalidate(product_id)
         if result.deleted_count > 0:
             return jsonify({"message": "Product deleted successfully"}), 200
         else:
@@ -355,27 +948,197 @@ def insert_feedback():
             return jsonify({"error": "Missing required fields"}), 400
 
         # Optional: check if product exists
-        if not collection.find_one({"product_id": int(data['product_id'])}):
+        if not product_cache.exists(int(data['product_id'])):
             return jsonify({"error": "Product with this ID does not exist"}), 400
 
         # Insert data
-        result = collection2.insert_one({
+        feedback = {
             'product_id': int(data['product_id']),
             'user_name': str(data['user_name']),
             'feedback_text': str(data['feedback_text']),
             'rating': int(data['rating'])
-        })
+        }
+        result = collection2.insert_one(feedback)
+        apply_feedback_change(feedback['product_id'], added=feedback)
 
         return jsonify({"message": "Feedback inserted successfully", "id": str(result.inserted_id)}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500 
 
+# Stream a cursor as NDJSON without building the list; documents are fetched in cursor batches
+def ndjson_response(cursor, drop_id=False):
+    def generate():
+        for document in cursor:
+            if drop_id:
+                document.pop('_id', None)
+            yield json.dumps(document, default=str) + "\n"
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# POST (bulk insert feedbacks)
+# This endpoint inserts many feedbacks at once from a JSON array or a streamed NDJSON body (one feedback per line).
+@app.route("/insert_feedbacks_bulk", methods=["POST"])
+@swag_from({
+    'tags': ['Insert Feedback'],
+    'consumes': ['application/json', 'application/x-ndjson'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'product_id': {'type': 'integer'},
+                        'user_name': {'type': 'string'},
+                        'feedback_text': {'type': 'string'},
+                        'rating': {'type': 'integer'}
+                    },
+                    'required': ['product_id', 'user_name', 'feedback_text', 'rating']
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Feedbacks inserted, with the rows that failed',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'inserted': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'errors': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'row': {'type': 'integer'},
+                                'error': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            'description': 'Body is not a JSON array or NDJSON'
+        },
+        500: {
+            'description': 'Internal Server Error'
+        }
+    }
+})
+def insert_feedbacks_bulk():
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            rows = ndjson_rows(request.stream)
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, list):
+                return jsonify({"error": "Body must be a JSON array or NDJSON"}), 400
+            rows = enumerate(data)
+
+        inserted, errors = 0, []
+        known_products = set()
+        for chunk in chunked(rows, bulk_chunk_size):
+            chunk_inserted, chunk_errors = insert_feedback_chunk(chunk, known_products)
+            inserted += chunk_inserted
+            errors.extend(chunk_errors)
+
+        return jsonify({
+            "message": "Bulk feedback insert completed",
+            "inserted": inserted,
+            "failed": len(errors),
+            "errors": errors
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# (row number, payload) for each non-blank line of an NDJSON stream; unparsable lines carry the exception
+def ndjson_rows(stream):
+    for row, line in enumerate(stream):
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, e
+
+# Validate and insert one chunk of (row, payload) pairs: one $in lookup for the products, one insert_many
+def insert_feedback_chunk(chunk, known_products):
+    errors, rows, feedbacks = [], [], []
+    for row, data in chunk:
+        try:
+            if isinstance(data, Exception):
+                raise data
+            feedbacks.append(feedback_document(data))
+            rows.append(row)
+        except (ValueError, TypeError) as e:
+            errors.append({"row": row, "error": str(e)})
+
+    unknown = {feedback['product_id'] for feedback in feedbacks} - known_products
+    if unknown:
+        found = collection.find({"product_id": {"$in": list(unknown)}}, {'_id': 0, 'product_id': 1})
+        known_products.update(product['product_id'] for product in found)
+
+    valid_rows, valid = [], []
+    for row, feedback in zip(rows, feedbacks):
+        if feedback['product_id'] in known_products:
+            valid_rows.append(row)
+            valid.append(feedback)
+        else:
+            errors.append({"row": row, "error": "Product with this ID does not exist"})
+    if not valid:
+        return 0, errors
+
+    failed = set()
+    try:
+        collection2.insert_many(valid, ordered=False)
+    except BulkWriteError as e:
+        for write_error in e.details.get('writeErrors', []):
+            failed.add(write_error['index'])
+            errors.append({"row": valid_rows[write_error['index']], "error": write_error['errmsg']})
+
+    # keep the sentiment counters in step: one update per product in the chunk
+    by_product = {}
+    for index, feedback in enumerate(valid):
+        if index not in failed:
+            by_product.setdefault(feedback['product_id'], []).append(feedback)
+    for product_id, added in by_product.items():
+        apply_feedback_changes(product_id, added=added)
+    return len(valid) - len(failed), errors
+
 # GET (get all feedbacks from the collection)
 # This endpoint retrieves all feedbacks from the database.
 @app.route("/get_all_feedbacks", methods=["GET"])
 @swag_from({
     'tags': ['Get All Feedbacks'],
+    'parameters': [
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'description': 'Page size (omit to return everything)'
+        },
+        {
+            'name': 'after',
+            'in': 'query',
+            'type': 'string',
+            'description': 'next_after value of the previous page'
+        },
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['json', 'ndjson'],
+            'default': 'json',
+            'description': 'ndjson streams one document per line straight from the cursor'
+        }
+    ],
     'responses': {
         200: {
             'description': 'List of All Feedbacks',
@@ -394,7 +1157,8 @@ def insert_feedback():
                             },
                             'required': ['product_id', 'user_name', 'feedback_text', 'rating']
                         }
-                    }
+                    },
+                    'next_after': {'type': 'string'}
                 }
             },
             'examples': {
@@ -432,8 +1196,35 @@ def insert_feedback():
 })
 def get_all_feedbacks():
     try:
-        feedbacks = list(collection2.find({}, {'_id': 0}))
-        return jsonify({"feedbacks": feedbacks}), 200
+        limit = int(request.args.get('limit', 0))
+        after = request.args.get('after')
+        if request.args.get('format') == 'ndjson' and not (limit or after):
+            return ndjson_response(collection2.find({}, {'_id': 0}, batch_size=cursor_batch_size))
+        if not (limit or after):
+            feedbacks = list(collection2.find({}, {'_id': 0}))
+            return jsonify({"feedbacks": feedbacks}), 200
+
+        # keyset pagination on (product_id, _id): product_id alone is not unique for feedbacks
+        query = {}
+        if after:
+            after_product, after_id = after.split(':')
+            query = {"$or": [
+                {"product_id": {"$gt": int(after_product)}},
+                {"product_id": int(after_product), "_id": {"$gt": ObjectId(after_id)}}
+            ]}
+        cursor = collection2.find(query, batch_size=cursor_batch_size).sort(
+            [("product_id", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]).limit(limit)
+
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(cursor, drop_id=True)
+
+        feedbacks, next_after = [], None
+        for feedback in cursor:
+            next_after = f"{feedback['product_id']}:{feedback.pop('_id')}"
+            feedbacks.append(feedback)
+        if not limit or len(feedbacks) < limit:
+            next_after = None
+        return jsonify({"feedbacks": feedbacks, "next_after": next_after}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -524,9 +1315,10 @@ def get_feedback_by_product(product_id):
 })
 def update_feedback(product_id):
     try:
-        data = request.get_json()
-        result = collection2.update_one({"product_id": product_id}, {"$set": data})
-        if result.matched_count > 0:
+        data = clean_feedback_update(request.get_json())
+        previous = collection2.find_one_and_update({"product_id": product_id}, {"$set": data})
+        if previous:
+            apply_feedback_update(previous, data)
             return jsonify({"message": "Feedback updated successfully"}), 200
         else:
             return jsonify({"error": "Feedback not found"}), 404
@@ -574,9 +1366,10 @@ def update_feedback(product_id):
 })
 def patch_feedback(product_id):
     try:
-        data = request.get_json()
-        result = collection2.update_one({"product_id": product_id}, {"$set": data})
-        if result.matched_count > 0:
+        data = clean_feedback_update(request.get_json())
+        previous = collection2.find_one_and_update({"product_id": product_id}, {"$set": data})
+        if previous:
+            apply_feedback_update(previous, data)
             return jsonify({"message": "Feedback updated successfully"}), 200
         else:
             return jsonify({"error": "Feedback not found"}), 404
@@ -611,8 +1404,9 @@ def patch_feedback(product_id):
 })
 def delete_feedback(product_id):
     try:
-        result = collection2.delete_one({"product_id": product_id})
-        if result.deleted_count > 0:
+        deleted = collection2.find_one_and_delete({"product_id": product_id})
+        if deleted:
+            apply_feedback_change(product_id, removed=deleted)
             return jsonify({"message": "Feedback deleted successfully"}), 200
         else:
             return jsonify({"error": "Feedback not found"}), 404
@@ -631,6 +1425,34 @@ def delete_feedback(product_id):
             'type': 'integer',
             'required': True,
             'description': 'ID of the product to analyze feedback for'
+        },
+        {
+            'name': 'mode',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['stored', 'rating', 'pipeline', 'text'],
+            'default': 'stored',
+            'description': 'stored: stats kept in sentimentscore (recomputed in the background), '
+                           'rating: analyze in the app, pipeline: compute stats in a MongoDB aggregation, '
+                           'text: score feedback_text with TextBlob'
+        },
+        {
+            'name': 'include_feedbacks',
+            'in': 'query',
+            'type': 'boolean',
+            'description': 'Return the per-feedback analyzed_feedbacks list (default: false in stored and pipeline modes, true otherwise)'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'description': 'Page size for analyzed_feedbacks (0 returns all of them)'
+        },
+        {
+            'name': 'after',
+            'in': 'query',
+            'type': 'string',
+            'description': 'next_after value of the previous page'
         }
     ],
     'responses': {
@@ -652,24 +1474,84 @@ def delete_feedback(product_id):
                                 'sentiment': {'type': 'string'}
                             }
                         }
-                    }
+                    },
+                    'next_after': {'type': 'string'},
+                    'stats': {'type': 'object'},
+                    'computed_at': {'type': 'string'},
+                    'stale': {'type': 'boolean'}
                 }
             }
         },
+        400: {'description': 'Product with this ID does not exist'},
+        404: {'description': 'No feedbacks found for this product ID'},
         500: {'description': 'Internal Server Error'}
     }
 })
 
 def analyze_sentiments(product_id):
     try:
+        mode = request.args.get('mode', 'stored')
+        # stored and pipeline compute stats without the raw feedbacks: only page through them when asked
+        include_default = 'false' if mode in ('stored', 'pipeline') else 'true'
+        include_feedbacks = request.args.get('include_feedbacks', include_default).lower() == 'true'
+        limit = int(request.args.get('limit', 0))
+        after = request.args.get('after')
+        if mode not in ('stored', 'rating', 'pipeline', 'text'):
+            return jsonify({"error": "mode must be one of: stored, rating, pipeline, text"}), 400
+
+        if mode == 'stored':
+            # no computation in the request: the scheduler keeps the stored stats up to date
+            counters = load_sentiment_counters(product_id)
+            if counters is None:
+                return jsonify({"error": "Product with this ID does not exist"}), 400
+            if not counters.get('total_feedbacks'):
+                return jsonify({"error": "No feedbacks found for this product ID"}), 404
+            response = {"message": "Sentiment stats read from sentimentscore", "stats": stats_from_counters(counters)}
+            response.update(sentiment_freshness(counters))
+            if include_feedbacks:
+                response['analyzed_feedbacks'], response['next_after'] = analyzed_feedback_page(product_id, limit, after)
+            return jsonify(response), 200
+
         # check if product exists
-        if not collection.find_one({"product_id": product_id}):
+        if not product_cache.exists(product_id):
             return jsonify({"error": "Product with this ID does not exist"}), 400
+
+        if mode == 'pipeline':
+            # stats computed by MongoDB, feedbacks only read back when asked for (one page at a time)
+            marker = counters_marker(product_id)
+            counters = aggregate_sentiment_counters(product_id)
+            if counters is None:
+                return jsonify({"error": "No feedbacks found for this product ID"}), 404
+            response = {
+                "message": "Sentiment analysis completed using aggregation pipeline",
+                "stats": stats_from_counters(store_sentiment_counters(counters, marker))
+            }
+            if include_feedbacks:
+                response['analyzed_feedbacks'], response['next_after'] = analyzed_feedback_page(product_id, limit, after)
+            return jsonify(response), 200
+
+        if mode == 'text':
+            # polarity from the feedback text, scored on the process pool (cached per text hash)
+            feedbacks = list(collection2.find(text_feedback_query(product_id), TEXT_PROJECTION))
+            if not feedbacks:
+                return jsonify({"error": "No feedbacks found for this product ID"}), 404
+            polarities = text_polarities(feedbacks)
+            stats = text_stats(product_id, feedbacks, polarities)
+            collection3.update_one({"product_id": product_id}, {"$set": {"text_stats": stats}}, upsert=True)
+
+            response = {"message": "Sentiment analysis completed using feedback text", "stats": stats}
+            if include_feedbacks and (limit or after):
+                response['analyzed_feedbacks'], response['next_after'] = analyzed_feedback_page(product_id, limit, after, mode)
+            elif include_feedbacks:
+                response['analyzed_feedbacks'] = [analyzed_feedback(product_id, f, p) for f, p in zip(feedbacks, polarities)]
+            return jsonify(response), 200
+
         # check if feedback exists
         if not collection2.find_one({"product_id": product_id}):
             return jsonify({"error": "No feedbacks found for this product ID"}), 404
          
         #fetch feedbacks for the product
+        marker = counters_marker(product_id)
         feedbacks = list(collection2.find({'product_id': product_id}))
         analyzed = []
 
@@ -680,15 +1562,8 @@ def analyze_sentiments(product_id):
                 continue  # Skip if no rating
 
             # Convert rating to sentiment and polarity-like score
-            if rating >= 4:
-                sentiment = "positive"
-            elif rating == 3:
-                sentiment = "neutral"
-            else:
-                sentiment = "negative"
-
-            polarity = round((rating - 3) / 2, 2)  # Normalize to range -1 to +1
-    
+            sentiment, polarity = rating_sentiment(rating)
+
         # create processed feedback entry
             result = {
                 'product_id': product_id,
@@ -701,47 +1576,223 @@ def analyze_sentiments(product_id):
             analyzed.append(result)
 
         # STATS SECTION (calclate stats)
-        # Calculate total feedbacks, average polarity, most positive and most negative feedbacks
-        total_feedbacks = len(analyzed)
-        avg_polarity = round(sum(f['polarity'] for f in analyzed) / total_feedbacks, 3) if total_feedbacks else 0
-        
-        most_positive = max(analyzed, key=lambda x: x['polarity'], default=None)
-        most_negative = min(analyzed, key=lambda x: x['polarity'], default=None)
-
-    #store stats in sentimentscore collection
-    # Create a new document with the stats
-        stats = {
-            "product_id": product_id, 
-            "total_feedbacks": total_feedbacks,
-            "average_polarity": avg_polarity,
-            "average_sentiment": "positive" if avg_polarity > 0.2 else "negative" if avg_polarity < -0.2 else "neutral",
-            "most_positive_feedback": {
-                "text": most_positive['feedback_text'] if most_positive else None,
-                "polarity": most_positive['polarity'] if most_positive else None,
-                "rating": most_positive['rating'] if most_positive else None
-            } if most_positive else None,
-            "most_negative_feedback": {
-                "text": most_negative['feedback_text'] if most_negative else None,
-                "polarity": most_negative['polarity'] if most_negative else None,
-                "rating": most_negative['rating'] if most_negative else None
-            } if most_negative else None
-        }
-        #update or insert stats in sentimentscore collection
-        collection3.update_one(
-            {"product_id": product_id},
-            {"$set": stats},
-            upsert=True
-        )
+        # Rebuild the running counters from the full scan; this also repairs drifted counters
+        counters = store_sentiment_counters(counters_from_feedbacks(product_id, feedbacks), marker)
+        stats = stats_from_counters(counters)
         # Return the analyzed feedbacks and stats
-        return jsonify({
-            "message": "Sentiment analysis completed using rating",
-            "analyzed_feedbacks": analyzed,
-            "stats": stats
-        }), 200
+        response = {"message": "Sentiment analysis completed using rating", "stats": stats}
+        if include_feedbacks and (limit or after):
+            response['analyzed_feedbacks'], response['next_after'] = analyzed_feedback_page(product_id, limit, after)
+        elif include_feedbacks:
+            response['analyzed_feedbacks'] = analyzed
+        return jsonify(response), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# GET (sentiment stats from the running counters)
+# This endpoint reads the counters kept up to date by the feedback endpoints, without rescanning feedbacks.
+@app.route("/sentiment_stats/<int:product_id>", methods=["GET"])
+@swag_from({
+    'tags': ['Sentiment Analysis'],
+    'parameters': [
+        {
+            'name': 'product_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True,
+            'description': 'ID of the product to read sentiment stats for'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Sentiment stats read from the sentimentscore collection',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'product_id': {'type': 'integer'},
+                    'total_feedbacks': {'type': 'integer'},
+                    'average_polarity': {'type': 'number'},
+                    'average_sentiment': {'type': 'string'},
+                    'rating_counts': {'type': 'object'},
+                    'most_positive_feedback': {'type': 'object'},
+                    'most_negative_feedback': {'type': 'object'},
+                    'computed_at': {'type': 'string'},
+                    'stale': {'type': 'boolean'}
+                }
+            }
+        },
+        400: {'description': 'Product with this ID does not exist'},
+        404: {'description': 'No feedbacks found for this product ID'},
+        500: {'description': 'Internal Server Error'}
+    }
+})
+def sentiment_stats(product_id):
+    try:
+        counters = load_sentiment_counters(product_id)
+        if counters is None:
+            return jsonify({"error": "Product with this ID does not exist"}), 400
+        if not counters.get('total_feedbacks'):
+            return jsonify({"error": "No feedbacks found for this product ID"}), 404
+        return jsonify(dict(stats_from_counters(counters), **sentiment_freshness(counters))), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Sorted walk of the sentimentscore (average_polarity, product_id) index, joined with products
+def leaderboard_stages(direction, limit, category=None):
+    stages = [
+        {"$match": {"average_polarity": {"$exists": True}, "total_feedbacks": {"$gt": 0}}},
+        {"$sort": {"average_polarity": direction, "product_id": direction}},
+        {"$lookup": {"from": collection_name1, "localField": "product_id", "foreignField": "product_id", "as": "product"}},
+        {"$unwind": "$product"}
+    ]
+    if category:
+        stages.append({"$match": {"product.product_category": category}})
+    return stages + [
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0,
+            "board": {"$literal": "top" if direction == pymongo.DESCENDING else "bottom"},
+            "product_id": 1,
+            "product_name": "$product.product_name",
+            "product_category": "$product.product_category",
+            "total_feedbacks": 1,
+            "average_polarity": 1,
+            "average_sentiment": 1
+        }}
+    ]
+
+# GET (sentiment leaderboard)
+# This endpoint returns the best and worst rated products by average polarity in one aggregation.
+@app.route("/sentiment_leaderboard", methods=["GET"])
+@swag_from({
+    'tags': ['Sentiment Analysis'],
+    'parameters': [
+        {
+            'name': 'n',
+            'in': 'query',
+            'type': 'integer',
+            'default': 10,
+            'description': 'Number of products in the top and in the bottom list (max 100)'
+        },
+        {
+            'name': 'product_category',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Only rank products of this category'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Top and bottom products by average polarity',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'top': {'type': 'array', 'items': {'type': 'object'}},
+                    'bottom': {'type': 'array', 'items': {'type': 'object'}}
+                }
+            }
+        },
+        400: {'description': 'Invalid Request'},
+        500: {'description': 'Internal Server Error'}
+    }
+})
+def sentiment_leaderboard():
+    try:
+        limit = int(request.args.get('n', 10))
+        if not 1 <= limit <= 100:
+            return jsonify({"error": "n must be between 1 and 100"}), 400
+        category = request.args.get('product_category')
+
+        pipeline = leaderboard_stages(pymongo.DESCENDING, limit, category) + [
+            {"$unionWith": {"coll": collection_name3, "pipeline": leaderboard_stages(pymongo.ASCENDING, limit, category)}}
+        ]
+        boards = {"top": [], "bottom": []}
+        for entry in collection3.aggregate(pipeline):
+            boards[entry.pop('board')].append(entry)
+        return jsonify(boards), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# POST (recompute sentiment for all products)
+# This endpoint refreshes the sentimentscore collection for the whole catalog in one batch job.
+@app.route("/recompute_sentiments", methods=["POST"])
+@swag_from({
+    'tags': ['Sentiment Analysis'],
+    'responses': {
+        200: {
+            'description': 'Sentiment stats recomputed for every product',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'message': {'type': 'string'},
+                    'products': {'type': 'integer'},
+                    'emptied_products': {'type': 'integer'},
+                    'seconds': {'type': 'number'},
+                    'products_per_sec': {'type': 'number'}
+                }
+            }
+        },
+        500: {'description': 'Internal Server Error'}
+    }
+})
+def recompute_sentiments():
+    try:
+        report = recompute_all_sentiments()
+        return jsonify(dict(report, message="Sentiment stats recomputed for all products")), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# GET (product cache statistics)
+# This endpoint reports hit/miss counters of the in-process product cache.
+@app.route("/cache_stats", methods=["GET"])
+@swag_from({
+    'tags': ['Cache'],
+    'responses': {
+        200: {
+            'description': 'Product cache statistics',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'hits': {'type': 'integer'},
+                    'misses': {'type': 'integer'},
+                    'hit_ratio': {'type': 'number'},
+                    'size': {'type': 'integer'},
+                    'max_size': {'type': 'integer'},
+                    'ttl': {'type': 'number'}
+                }
+            }
+        }
+    }
+})
+def cache_stats():
+    return jsonify(product_cache.stats()), 200
+
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Product Feedback Analyzer")
+    parser.add_argument('command', nargs='?', default='serve',
+                        choices=['serve', 'ensure_indexes', 'check_indexes', 'backfill_text_sentiment',
+                                 'recompute_worker', 'recompute_all'])
+    args = parser.parse_args()
+
+    if args.command == 'ensure_indexes':
+        ensure_indexes()
+    elif args.command == 'check_indexes':
+        check_indexes()
+    elif args.command == 'backfill_text_sentiment':
+        backfill_text_sentiment()
+    elif args.command == 'recompute_worker':
+        run_sentiment_scheduler()
+    elif args.command == 'recompute_all':
+        ensure_indexes()
+        report = recompute_all_sentiments()
+        print(f"Recomputed {report['products']} products ({report['emptied_products']} emptied) in "
+              f"{report['seconds']}s ({report['products_per_sec']} products/sec)")
+    else:
+        ensure_indexes()
+        if os.getenv('WERKZEUG_RUN_MAIN') == 'true':  # only in the serving process, not the reloader
+            start_sentiment_scheduler()
+        app.run(debug=True)
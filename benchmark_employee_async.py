@@ -0,0 +1,134 @@
+#benchmark: sync (Flask+pymongo) vs async (Quart+Motor) employee apps on an in-memory MongoDB stand-in.
+#mongomock / mongomock_motor replace the real collections and every MongoDB call waits --latency ms,
+#standing in for the network round trip. The sync app serves one request at a time (one worker),
+#the async app keeps --concurrency requests in flight on one event loop.
+#both /out handlers do the same work: the ETag version read plus the find (two simulated round trips).
+#usage: python benchmark_employee_async.py --requests 2000 --concurrency 50 --latency 2
+import argparse
+import asyncio
+import inspect
+import time
+import mongomock
+from mongomock_motor import AsyncMongoMockClient
+import Employee_Collection as sync_app
+import Employee_Collection_async as async_app
+
+
+class SlowCollection:
+    def __init__(self, inner, latency):
+        self.inner = inner
+        self.latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self.latency)
+            return attr(*args, **kwargs)
+        return call
+
+
+class AsyncSlowCursor:
+    def __init__(self, inner, latency):
+        self.inner = inner
+        self.latency = latency
+
+    def sort(self, *args, **kwargs):
+        self.inner = self.inner.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs):
+        self.inner = self.inner.limit(*args, **kwargs)
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(self.latency)
+        return await self.inner.to_list(length)
+
+
+class AsyncSlowCollection:
+    def __init__(self, inner, latency):
+        self.inner = inner
+        self.latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self.inner, name)
+        if name == 'find':
+            #the round trip happens when the cursor is read
+            return lambda *args, **kwargs: AsyncSlowCursor(attr(*args, **kwargs), self.latency)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self.latency)
+            result = attr(*args, **kwargs)
+            return await result if inspect.isawaitable(result) else result
+        return call
+
+
+def seed(count):
+    return [{"emp_id": i, "name": f"Employee {i}", "age": 20 + i % 45, "salary": 30000 + (i * 37) % 90000}
+            for i in range(count)]
+
+
+def out_query(i):
+    return {"min_salary": 40000 + (i * 101) % 40000, "limit": 50}
+
+
+def report(variant, route, count, elapsed):
+    print(f"{variant:6} {route:8} {count:7} requests {elapsed:8.2f}s {count / elapsed:10.1f} req/sec")
+
+
+def bench_sync(args, employees):
+    database = mongomock.MongoClient().bench
+    sync_app.collection = SlowCollection(database.employees, args.latency / 1000)
+    sync_app.versions = SlowCollection(database.employees_versions, args.latency / 1000)
+    sync_app.collection.insert_many([dict(e) for e in employees])
+    client = sync_app.app.test_client()
+
+    started = time.perf_counter()
+    for i in range(args.requests):
+        client.get('/out', query_string=out_query(i))
+    report("sync", "GET /out", args.requests, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(args.requests):
+        client.post('/insert', json={"emp_id": args.employees + i, "name": "New", "age": 30, "salary": 50000})
+    report("sync", "POST /insert", args.requests, time.perf_counter() - started)
+
+
+async def bench_async(args, employees):
+    database = AsyncMongoMockClient().bench
+    await database.employees.insert_many([dict(e) for e in employees])
+    async_app.collection = AsyncSlowCollection(database.employees, args.latency / 1000)
+    async_app.versions = AsyncSlowCollection(database.employees_versions, args.latency / 1000)
+    client = async_app.app.test_client()
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def run(request):
+        async with limit:
+            return await request
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(client.get('/out', query_string=out_query(i))) for i in range(args.requests)))
+    report("async", "GET /out", args.requests, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(client.post('/insert', json={
+        "emp_id": args.employees + i, "name": "New", "age": 30, "salary": 50000})) for i in range(args.requests)))
+    report("async", "POST /insert", args.requests, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync vs async Employee_Collection benchmark")
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=2.0, help='simulated MongoDB round trip in ms')
+    args = parser.parse_args()
+
+    employees = seed(args.employees)
+    bench_sync(args, employees)
+    asyncio.run(bench_async(args, employees))
@@ -0,0 +1,49 @@
+#benchmark: serializing Task rows with tasks_schema (marshmallow over ORM objects) vs the fast path of
+#practice2.py (dicts from row tuples + orjson when installed). No database is touched: the rows are built
+#in memory, so only serialization is measured.
+#usage: python benchmark_task_serialize.py --sizes 1000 100000 1000000
+import argparse
+import json
+import os
+import time
+
+#practice2 needs a database URI when it is imported; it is never connected to
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+import practice2
+
+
+def report(variant, rows, elapsed):
+    print(f"{variant:12} {rows:9} rows {elapsed:8.2f}s {rows / elapsed:12.1f} rows/sec")
+
+
+def rows(count):
+    return [(i, f"Employee {i}", 30000 + (i * 37) % 90000) for i in range(1, count + 1)]
+
+
+def tasks(row_tuples):
+    objects = []
+    for emp_id, emp_name, emp_salary in row_tuples:
+        task = practice2.Task(emp_name=emp_name, emp_salary=emp_salary)
+        task.emp_id = emp_id
+        objects.append(task)
+    return objects
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="marshmallow vs fast Task serialization benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+    print(f"encoder: {'orjson' if practice2.orjson is not None else 'json'}")
+
+    with practice2.app.app_context():
+        for size in args.sizes:
+            row_tuples = rows(size)
+            objects = tasks(row_tuples)
+
+            started = time.perf_counter()
+            json.dumps(practice2.tasks_schema.dump(objects))
+            report("marshmallow", size, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            practice2.dumps(practice2.task_dicts(row_tuples))
+            report("fast", size, time.perf_counter() - started)
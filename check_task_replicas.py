@@ -0,0 +1,58 @@
+#check: read-replica routing of practice2.py on two local SQLite files.
+#the primary and the replica hold different rows, so every read shows which database answered:
+#GETs must read the replica, writes and reads after a flush in the same request the primary.
+#usage: python check_task_replicas.py
+import os
+import tempfile
+
+#practice2 reads DATABASE_URL / DATABASE_REPLICA_URLS when it is imported
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'primary.db')
+os.environ['DATABASE_REPLICA_URLS'] = 'sqlite:///' + os.path.join(directory, 'replica.db')
+import practice2
+from practice2 import app, db, Task
+
+
+def names(engine):
+    with engine.connect() as connection:
+        return [row.emp_name for row in connection.execute(db.select(Task.emp_name).order_by(Task.emp_id))]
+
+
+def check(description, condition):
+    print(f"{'ok  ' if condition else 'FAIL'} {description}")
+    if not condition:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        primary, replica = db.engine, db.engines['replica0']
+        for engine, name in ((primary, 'from primary'), (replica, 'from replica')):
+            Task.__table__.create(engine)
+            with engine.begin() as connection:
+                connection.execute(db.insert(Task), [{'emp_name': name, 'emp_salary': 50000}])
+
+    client = app.test_client()
+    check("GET /task reads the replica", [t['emp_name'] for t in client.get('/task').get_json()] == ['from replica'])
+    check("GET /task?stream=true reads the replica",
+          [t['emp_name'] for t in client.get('/task?stream=true').get_json()] == ['from replica'])
+    check("GET /task/<emp_id> reads the replica", client.get('/task/1').get_json()['emp_name'] == 'from replica')
+
+    client.post('/task', json={'emp_name': 'written', 'emp_salary': 60000})
+    with app.app_context():
+        check("POST /task writes the primary", names(primary) == ['from primary', 'written'])
+        check("POST /task leaves the replica alone", names(replica) == ['from replica'])
+
+    with app.test_request_context('/task', method='POST'):
+        check("reads of a non-GET request use the primary", practice2.read_bind() is db.engine)
+
+    with app.test_request_context('/task', method='GET'):
+        check("a GET request reads the replica before any write", practice2.read_bind() is db.engines['replica0'])
+        db.session.add(Task(emp_name='pending', emp_salary=1))
+        db.session.flush()
+        check("reads after a flush in the same request use the primary", practice2.read_bind() is db.engine)
+        check("the flushed row is visible to that read",
+              'pending' in [t['emp_name'] for t in practice2.task_page()])
+        db.session.rollback()
+
+    print("replica routing ok")